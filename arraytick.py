@@ -0,0 +1,106 @@
+import collections.abc
+from decimal import Decimal
+
+import numpy as np
+
+# array-backed ticks: the last prices of a basket in one float64 array, in
+# the column order an adjuster fixes at register() (see
+# _Adjuster.ARRAY_TICKS), instead of a dict of Decimals:
+#
+#   adjuster.register(orders)
+#   for row in t.iter_arrays(symbols=adjuster.columns.symbols):
+#       orders = adjuster.get_orders(ArrayTick(adjuster.columns, row))
+#
+# an ArrayTick is a mapping of symbol to Decimal like any other tick, so
+# everything indexing tick[asset] works unchanged (missing prices are NaN
+# and left out); a price is only made a Decimal when it is looked up. On
+# top of that it has the vectorized quantities of the whole basket,
+# computed once per tick; the rules take their distance from the target
+# price from delta() rather than computing it per asset
+
+
+class Columns:
+    def __init__(self, orders):
+        # one original order per asset, in column order
+        orders = list(orders)
+        self.symbols = [o.asset for o in orders]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.target = np.fromiter(
+            (float(o.target_price) for o in orders), np.float64, len(orders)
+        )
+        self.sign = np.fromiter(
+            (-1.0 if o.verb == "sell" else 1.0 for o in orders),
+            np.float64,
+            len(orders),
+        )
+        self.amount = np.fromiter(
+            (float(o.amount) for o in orders), np.float64, len(orders)
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def positions(self, assets):
+        return np.fromiter(
+            (self.index[a] for a in assets), np.intp, len(assets)
+        )
+
+
+class ArrayTick(collections.abc.Mapping):
+    __slots__ = ("columns", "prices", "_values", "_decimals", "_delta")
+
+    def __init__(self, columns, prices):
+        self.columns = columns
+        self.prices = np.asarray(prices, dtype=np.float64)
+        # the prices as floats, and the Decimals made of them so far
+        self._values = self.prices.tolist()
+        self._decimals = {}
+        self._delta = None
+
+    @classmethod
+    def from_mapping(cls, columns, tick):
+        return cls(
+            columns,
+            np.fromiter(
+                (float(tick.get(s, "nan")) for s in columns.symbols),
+                np.float64,
+                len(columns),
+            ),
+        )
+
+    def __getitem__(self, asset):
+        price = self._decimals.get(asset)
+        if price is None:
+            p = self._values[self.columns.index[asset]]
+            if p != p:
+                raise KeyError(asset)
+            # the same Decimal tape.iter_ticks() makes of the float
+            price = self._decimals[asset] = Decimal(repr(p))
+        return price
+
+    def __contains__(self, asset):
+        i = self.columns.index.get(asset)
+        return i is not None and self._values[i] == self._values[i]
+
+    def __iter__(self):
+        for s, p in zip(self.columns.symbols, self._values):
+            if p == p:
+                yield s
+
+    def __len__(self):
+        return len(self._values) - int(np.isnan(self.prices).sum())
+
+    # relative distance from the target price in percent, positive when the
+    # price moved against the order (see _Adjuster._get_delta), per column
+    def delta(self):
+        if self._delta is None:
+            c = self.columns
+            delta = (self.prices - c.target) / c.target * 100 * c.sign
+            self._delta = (delta, delta.tolist())
+        return self._delta[0]
+
+    # delta() of a single asset, as a Decimal
+    def delta_of(self, asset):
+        if self._delta is None:
+            self.delta()
+        return Decimal(repr(self._delta[1][self.columns.index[asset]]))
@@ -0,0 +1,241 @@
+import argparse
+import datetime
+from decimal import Decimal
+import json
+import math
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import priceadjust
+import replay
+
+RULES = tuple(priceadjust._RULES)
+SIZES = (1, 10, 100, 1000)
+
+
+# synthetic basket: random walks around a random starting price, a penny
+# grid and alternating buy/sell orders; seeded so that runs are comparable
+def make_basket(size, ticks, seed=0):
+    rng = random.Random(seed)
+    assets = ["S%04d" % i for i in range(size)]
+    start = {a: Decimal(rng.randint(1000, 50000)) / 100 for a in assets}
+    tape = []
+    prices = dict(start)
+    for _ in range(ticks):
+        for a in assets:
+            step = rng.choice((-1, 0, 0, 1)) * replay.PENNY
+            prices[a] = max(replay.PENNY, prices[a] + step)
+        tape.append(dict(prices))
+    return assets, start, tape
+
+
+def _make_orders(assets, start, clock):
+    return [
+        replay.ORDER_CLASSES["sell" if i % 2 else "buy"](
+            a, Decimal(100 + i % 50), start[a], time_cb=clock
+        )
+        for i, a in enumerate(assets)
+    ]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def bench_register(rule, assets, start, repeat=5):
+    clock = replay._Clock(datetime.datetime(2000, 1, 1))
+    timings = []
+    for _ in range(repeat):
+        orders = _make_orders(assets, start, clock)
+        adjuster = priceadjust.get_rules(rule)(replay.SimContext(300))
+        t0 = time.perf_counter()
+        adjuster.register(orders)
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+
+# a tick covers get_orders() plus, for rules that expect it, the adjust()
+# calls the engine makes on every order handed out
+def bench_ticks(rule, assets, start, tape, trace_allocations=True):
+    c = replay.SimContext(len(tape) * replay.TICK_PERIOD)
+    clock = replay._Clock(datetime.datetime(2000, 1, 1))
+    adjuster = priceadjust.get_rules(rule)(c)
+    adjuster.register(_make_orders(assets, start, clock))
+    reprice = priceadjust.needs_adjust(adjuster)
+    broker = replay.SimBroker()
+
+    timings = []
+    peaks = []
+    blocks = []
+    for n, tick in enumerate(tape):
+        c.tick = tick
+        broker.match(tick)
+        # allocations are traced on every other tick only; tracing slows
+        # everything down and would skew the timings of those ticks
+        traced = trace_allocations and n % 2
+        if traced:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            base, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        orders = adjuster.get_orders(tick)
+        if reprice:
+            for o in orders:
+                adjuster.adjust(o, tick)
+        elapsed = time.perf_counter() - t0
+        if traced:
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            peaks.append(peak - base)
+            blocks.append(
+                sum(
+                    d.count_diff
+                    for d in after.compare_to(before, "filename")
+                    if d.count_diff > 0
+                )
+            )
+        else:
+            timings.append(elapsed)
+        broker.sync(orders)
+        clock.now += datetime.timedelta(seconds=replay.TICK_PERIOD)
+
+    return {
+        "p50": _percentile(timings, 0.5),
+        "p99": _percentile(timings, 0.99),
+        "alloc_peak_bytes": statistics.median(peaks) if peaks else None,
+        "alloc_blocks": statistics.median(blocks) if blocks else None,
+    }
+
+
+# exponent b of latency ~ n**b between the smallest and largest basket
+def scaling_exponent(points):
+    points = [(n, t) for n, t in points if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    (n0, t0), (n1, t1) = points[0], points[-1]
+    if n0 == n1:
+        return None
+    return math.log(t1 / t0) / math.log(n1 / n0)
+
+
+def run(rules=RULES, sizes=SIZES, ticks=40, seed=0, trace_allocations=True):
+    results = {"sizes": list(sizes), "ticks": ticks, "rules": {}}
+    for rule in rules:
+        per_size = []
+        for size in sizes:
+            assets, start, tape = make_basket(size, ticks, seed)
+            row = {"size": size}
+            row["register"] = bench_register(rule, assets, start)
+            row.update(
+                bench_ticks(rule, assets, start, tape, trace_allocations)
+            )
+            per_size.append(row)
+        results["rules"][rule] = {
+            "sizes": per_size,
+            "scaling": scaling_exponent(
+                [(r["size"], r["p50"]) for r in per_size]
+            ),
+        }
+    return results
+
+
+# rule/size/metric combinations that got slower than the baseline by more
+# than the given factor; differences below min_delta seconds are noise
+def regressions(results, baseline, factor=1.5, min_delta=0.0001):
+    found = []
+    for rule, res in results["rules"].items():
+        if rule not in baseline["rules"]:
+            continue
+        old = {r["size"]: r for r in baseline["rules"][rule]["sizes"]}
+        for row in res["sizes"]:
+            if row["size"] not in old:
+                continue
+            for metric in ("register", "p50", "p99"):
+                before = old[row["size"]][metric]
+                if (
+                    row[metric] > before * factor
+                    and row[metric] - before > min_delta
+                ):
+                    found.append((rule, row["size"], metric, before))
+    return found
+
+
+def format_results(results):
+    lines = [
+        "%-10s %6s %10s %10s %10s %10s %8s"
+        % ("rule", "size", "register", "p50", "p99", "alloc_kb", "blocks")
+    ]
+    for rule, res in results["rules"].items():
+        for r in res["sizes"]:
+            lines.append(
+                "%-10s %6d %8.3fms %8.3fms %8.3fms %10s %8s"
+                % (
+                    rule,
+                    r["size"],
+                    r["register"] * 1000,
+                    r["p50"] * 1000,
+                    r["p99"] * 1000,
+                    (
+                        "-"
+                        if r["alloc_peak_bytes"] is None
+                        else "%.1f" % (r["alloc_peak_bytes"] / 1024)
+                    ),
+                    "-" if r["alloc_blocks"] is None else r["alloc_blocks"],
+                )
+            )
+        if res["scaling"] is not None:
+            lines.append(
+                "%-10s scaling exponent %.2f" % (rule, res["scaling"])
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark register() and get_orders() of the rules."
+    )
+    parser.add_argument(
+        "-r", "--rule", action="append", choices=sorted(priceadjust._RULES)
+    )
+    parser.add_argument("-n", "--size", type=int, action="append")
+    parser.add_argument("--ticks", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-allocations", action="store_true")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument(
+        "--baseline",
+        help="JSON results to compare against; exits with 1 on regressions",
+    )
+    parser.add_argument("--factor", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.rule or RULES,
+        sorted(args.size) if args.size else SIZES,
+        args.ticks,
+        args.seed,
+        not args.no_allocations,
+    )
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.factor)
+        for rule, size, metric, old in found:
+            print(
+                "regression: %s/%d %s (was %.6fs)" % (rule, size, metric, old)
+            )
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+import collections
+from decimal import Decimal
+import os
+import pickle
+import struct
+import zlib
+
+import priceadjust
+
+# append-only journal of an adjuster's state, to resume an interval after a
+# restart:
+#
+#   journal = Journal("basket.journal")
+#   adjuster.register(orders)
+#   journal.start(adjuster, "delta", orders)
+#   ... every tick, after get_orders() (and adjust()):
+#   journal.record(adjuster)
+#
+#   after a restart, with the same original orders:
+#   adjuster = restore("basket.journal", c, orders, lookup)
+#
+# the file starts with a snapshot of every order and the rule's own state
+# (see _Adjuster.CHECKPOINT_ATTRS), followed by one record per tick with
+# what changed; it is rewritten as a single snapshot every SNAPSHOT_EVERY
+# ticks. Records are length prefixed pickles of plain tuples with a CRC, a
+# record torn by a crash is ignored.
+#
+# Every order gets a stable _order_id, which is meant to be used as the
+# client order id at the broker so that restored orders can be looked up.
+
+MAGIC = b"ADJJRNL1"
+_HEADER = struct.Struct("<II")  # payload length, crc32
+
+SNAPSHOT = 0
+TICK = 1
+
+FIELDS = (
+    "asset",
+    "verb",
+    "amount",
+    "target_price",
+    "filled",
+    "desired_price",
+    "actual_price",
+    "type",
+    "desired_type",
+    "posted",
+    "completed",
+    "_to_cancel",
+    "_accounted_for",
+    "_stop_loss",
+    "layer",
+    "_layer_locked",
+    "_start_time",
+    "_replaces_filled",
+)
+# kept as text in the journal, pickled Decimals are several times larger
+DECIMAL_FIELDS = frozenset(
+    (
+        "amount",
+        "target_price",
+        "filled",
+        "desired_price",
+        "actual_price",
+        "_replaces_filled",
+    )
+)
+_MISSING = object()
+
+State = collections.namedtuple(
+    "State", "rule overrides originals all pending orders attrs ticks"
+)
+
+
+def _attrs(adjuster):
+    values = {}
+    for name in adjuster.CHECKPOINT_ATTRS:
+        value = getattr(adjuster, name, None)
+        values[name] = dict(value) if isinstance(value, dict) else value
+    return values
+
+
+class Journal:
+    SNAPSHOT_EVERY = 1000
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._f = None
+        self._next_id = 0
+        self._rule = None
+        self._overrides = None
+        self._originals = ()
+        # what was last written: order id -> field values, id lists, attrs
+        self._orders = {}
+        self._all = None
+        self._pending = None
+        self._attrs = {}
+        self._ticks = 0
+
+    def _id(self, o):
+        order_id = getattr(o, "_order_id", None)
+        if order_id is None:
+            order_id = o._order_id = self._next_id
+        self._next_id = max(self._next_id, order_id + 1)
+        return order_id
+
+    def _order_state(self, o):
+        values = []
+        for name in FIELDS:
+            value = getattr(o, name, None)
+            if value is not None and name in DECIMAL_FIELDS:
+                value = str(value)
+            values.append(value)
+        values = tuple(values)
+        replaces = getattr(o, "_replaces", None)
+        return values + (None if replaces is None else self._id(replaces),)
+
+    def _write(self, record):
+        payload = pickle.dumps(record, protocol=4)
+        self._f.write(_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._f.write(payload)
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    # right after register(); starts a new journal
+    def start(self, adjuster, rule, orders):
+        self._rule = rule
+        self._overrides = dict(getattr(adjuster, "param_overrides", {}))
+        self._originals = [self._id(o) for o in orders]
+        self._ticks = 0
+        self._snapshot(adjuster)
+
+    def _snapshot(self, adjuster):
+        self._orders = {}
+        self._all = self._pending = None
+        self._attrs = {}
+        orders, all_ids, pending_ids, attrs = self._diff(adjuster)
+        tmp_path = self.path + ".tmp"
+        if self._f is not None:
+            self._f.close()
+        self._f = open(tmp_path, "wb")
+        self._f.write(MAGIC)
+        self._write(
+            (
+                SNAPSHOT,
+                self._rule,
+                self._overrides,
+                self._originals,
+                all_ids,
+                pending_ids,
+                orders,
+                attrs,
+                self._ticks,
+            )
+        )
+        os.replace(tmp_path, self.path)
+
+    def _diff(self, adjuster):
+        orders = {}
+        seen = {}
+        for o in adjuster.all_orders:
+            seen[self._id(o)] = o
+        for o in adjuster._original_orders.values():
+            seen[self._id(o)] = o
+        all_ids = [self._id(o) for o in adjuster.all_orders]
+        pending_ids = [self._id(o) for o in adjuster.pending_orders]
+        for o in adjuster.pending_orders:
+            seen[self._id(o)] = o
+        for order_id, o in seen.items():
+            state = self._order_state(o)
+            if self._orders.get(order_id) != state:
+                orders[order_id] = state
+        # only keep what is still referenced
+        self._orders = {i: orders.get(i, self._orders.get(i)) for i in seen}
+        if all_ids == self._all:
+            all_ids = None
+        else:
+            self._all = all_ids
+        if pending_ids == self._pending:
+            pending_ids = None
+        else:
+            self._pending = pending_ids
+        attrs = {}
+        for name, value in _attrs(adjuster).items():
+            if self._attrs.get(name, _MISSING) != value:
+                attrs[name] = self._attrs[name] = value
+        return orders, all_ids, pending_ids, attrs
+
+    # after every get_orders() (and the adjust() calls the engine makes)
+    def record(self, adjuster):
+        self._ticks += 1
+        if self._ticks % self.SNAPSHOT_EVERY == 0:
+            self._snapshot(adjuster)
+            return
+        orders, all_ids, pending_ids, attrs = self._diff(adjuster)
+        self._write((TICK, self._ticks, all_ids, pending_ids, orders, attrs))
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def read(path):
+    # records of a journal up to the first incomplete or corrupt one
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not an adjuster journal" % path)
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            length, crc = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            yield pickle.loads(payload)
+
+
+def load(path):
+    state = None
+    for record in read(path):
+        if record[0] == SNAPSHOT:
+            _, rule, overrides, originals, all_ids, pending_ids = record[:6]
+            orders, attrs, ticks = record[6:]
+            state = State(
+                rule,
+                overrides,
+                originals,
+                all_ids,
+                pending_ids,
+                dict(orders),
+                dict(attrs),
+                ticks,
+            )
+        else:
+            _, ticks, all_ids, pending_ids, orders, attrs = record
+            state.orders.update(orders)
+            state.attrs.update(attrs)
+            state = state._replace(
+                all=state.all if all_ids is None else all_ids,
+                pending=state.pending if pending_ids is None else pending_ids,
+                ticks=ticks,
+            )
+    if state is None:
+        raise ValueError("%s has no snapshot" % path)
+    return state
+
+
+def _apply(o, order_id, values):
+    o._order_id = order_id
+    for name, value in zip(FIELDS, values):
+        if name in ("asset", "verb", "target_price"):
+            continue
+        if value is None and name in (
+            "layer",
+            "_layer_locked",
+            "_replaces_filled",
+        ):
+            continue
+        if value is not None and name in DECIMAL_FIELDS:
+            value = Decimal(value)
+        setattr(o, name, value)
+
+
+# could be at the broker: handed out, not done and either posted or about
+# to be when the journal was written
+def _maybe_live(o):
+    if o.completed or o._accounted_for:
+        return False
+    return o.posted or (not o._to_cancel and o.desired_price is not None)
+
+
+# rebuild an adjuster from its journal. orders are the original orders, as
+# passed to register() before the restart. lookup(o) reconciles orders that
+# may be at the broker; it returns None when the broker doesn't know the
+# order's _order_id, otherwise (filled, live). Without lookup such orders
+# are assumed to be live at their price, which can hold up an asset until
+# the engine catches up but never trades it twice
+def restore(path, c, orders, lookup=None):
+    state = load(path)
+    if len(orders) != len(state.originals):
+        raise ValueError("journal has %d orders" % len(state.originals))
+    objects = {}
+    for o, order_id in zip(orders, state.originals):
+        values = state.orders[order_id]
+        if (o.asset, o.verb) != tuple(values[:2]):
+            raise ValueError(
+                "journal order %s %s doesn't match %s %s"
+                % (values[1], values[0], o.verb, o.asset)
+            )
+        objects[order_id] = o
+
+    by_asset = {}
+    for o in orders:
+        by_asset.setdefault(o.asset, o)
+    for order_id in set(state.all) | set(state.pending):
+        if order_id in objects:
+            continue
+        values = state.orders[order_id]
+        proto = by_asset[values[0]]
+        objects[order_id] = proto.__class__(
+            values[0],
+            Decimal(values[2]),
+            Decimal(values[3]),
+            time_cb=proto.time_cb,
+            otype=values[7],
+        )
+
+    adjuster = priceadjust.get_rules(state.rule)(c)
+    if state.overrides:
+        adjuster.param_overrides = dict(state.overrides)
+    adjuster._restore(
+        orders,
+        [objects[i] for i in state.all],
+        [objects[i] for i in state.pending],
+        state.attrs,
+    )
+
+    # order state goes on last, register() may have touched the originals
+    for order_id, o in objects.items():
+        values = state.orders[order_id]
+        _apply(o, order_id, values[:-1])
+        replaces = values[-1]
+        if replaces is not None and replaces in objects:
+            o._replaces = objects[replaces]
+
+    for o in objects.values():
+        if not _maybe_live(o):
+            continue
+        if lookup is None:
+            if not o.posted:
+                o.posted = True
+                o.actual_price = o.desired_price
+            continue
+        found = lookup(o)
+        if found is None:
+            # never made it to the broker
+            o.posted = False
+            o.actual_price = None
+            continue
+        o.filled, live = found
+        o.posted = live
+        if live and o.actual_price is None:
+            # posted right after the journal was written
+            o.actual_price = o.desired_price
+        o.completed = o.filled >= o.amount
+        if not live and not o.completed:
+            # cancelled in the meantime
+            o._to_cancel = True
+            o.desired_price = None
+    return adjuster
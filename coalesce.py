@@ -0,0 +1,101 @@
+import collections
+
+# turns the orders handed out by an adjuster into broker requests; shared by
+# replay.SimBroker and driver.AsyncDriver
+
+POST = "post"
+CANCEL = "cancel"
+REPLACE = "replace"
+
+# a single broker request; for a replace, order takes over the broker order
+# of `replaces`, which is the order itself when it is only repriced
+Action = collections.namedtuple(
+    "Action", "kind order replaces", defaults=(None,)
+)
+
+
+# what needs to be sent to the broker for an order on its own
+def order_action(o):
+    if o.completed:
+        return None
+    if o._to_cancel or o.desired_price is None:
+        return CANCEL if o.posted else None
+    if not o.posted:
+        return POST
+    if o.actual_price != o.desired_price or o.type != o.desired_type:
+        return REPLACE
+    return None
+
+
+# the successor of an order that is being replaced (see
+# _Adjuster.REPLACE_ORDERS), or None
+def _successor_of(o):
+    old = getattr(o, "_replaces", None)
+    if old is None or o.posted or o.completed:
+        return None
+    return old
+
+
+# minimal batch of requests bringing the broker in line with the orders an
+# adjuster handed out: a cancel of a live order paired with the post of its
+# successor becomes a single replace, everything else maps one to one.
+# A successor is only ever sent as a replace; if its predecessor is gone
+# (filled or cancelled in the meantime) it is left alone and should be
+# abandoned, since posting it could trade more than what is left
+def diff(orders):
+    actions = []
+    replaced = set()
+    successors = set()
+    for o in orders:
+        old = _successor_of(o)
+        if old is None:
+            continue
+        successors.add(o)
+        if (
+            old.posted
+            and not old.completed
+            and not o._to_cancel
+            and o.desired_price is not None
+        ):
+            replaced.add(old)
+            actions.append(Action(REPLACE, o, old))
+    for o in orders:
+        if o in replaced or o in successors:
+            continue
+        kind = order_action(o)
+        if kind is not None:
+            actions.append(Action(kind, o, o if kind == REPLACE else None))
+    return actions
+
+
+# take fills the replaced order got after the adjuster sized its successor
+# (while the replace was queued) off the successor; returns False when
+# nothing is left of it, in which case the replaced order should only be
+# cancelled
+def trim(o):
+    old = getattr(o, "_replaces", None)
+    sized_at = getattr(o, "_replaces_filled", None)
+    if old is None or old is o or sized_at is None:
+        return True
+    late = old.filled - sized_at
+    if late > 0:
+        o.amount -= late
+        o._replaces_filled = old.filled
+    return o.amount > 0
+
+
+# successors that didn't make it to the broker; the adjuster accounts for
+# them as unfilled and drops them on its next tick
+def abandon(o):
+    o._to_cancel = True
+    o.desired_price = None
+
+
+def stale_successors(orders):
+    return [
+        o
+        for o in orders
+        if _successor_of(o) is not None
+        and not _successor_of(o).posted
+        and not o._to_cancel
+    ]
@@ -0,0 +1,329 @@
+import argparse
+import asyncio
+import collections
+import datetime
+from decimal import Decimal
+import math
+
+from blade import order
+
+import coalesce
+import priceadjust
+import tape
+
+
+# drives an adjuster from an async tick stream; posts and cancels run as
+# tasks with bounded concurrency, so a slow broker round-trip for one asset
+# doesn't hold up computing and sending the orders of the next tick
+#
+# the broker is an object with
+#   async post(o, price, otype) -> bool
+#   async cancel(o) -> bool (False if the order was no longer live)
+#   fills() -> async iterator of (order, amount, price)
+# and optionally
+#   async replace(old, new, price, otype) -> bool (False if old was no
+#       longer live), atomically moving old's broker order over to new
+# without replace, a replace is sent as a cancel followed by a post once
+# the cancel is acknowledged
+#
+# orders are marked posted as soon as a post is sent and only unmarked once
+# a cancel is acknowledged, so an adjuster never forgets an order the broker
+# may still fill while a request is in flight
+class AsyncDriver:
+    def __init__(self, adjuster, broker, max_in_flight=8, journal=None):
+        self.adjuster = adjuster
+        self.broker = broker
+        self.max_in_flight = max_in_flight
+        # checkpoint.Journal, written before anything is sent for a tick
+        self.journal = journal
+        self.stats = collections.Counter()
+        self._reprice = priceadjust.needs_adjust(adjuster)
+        self._in_flight = {}
+        self._semaphore = None
+
+    async def run(self, ticks):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        fills = asyncio.ensure_future(self._apply_fills())
+        try:
+            async for tick in ticks:
+                self.step(tick)
+                # give acknowledgements that already arrived a chance to be
+                # reconciled before the next tick
+                await asyncio.sleep(0)
+            await self.drain()
+        finally:
+            fills.cancel()
+
+    def step(self, tick):
+        orders = self.adjuster.get_orders(tick)
+        if self._reprice:
+            for o in orders:
+                self.adjuster.adjust(o, tick)
+        if self.journal is not None:
+            self.journal.record(self.adjuster)
+        for o in coalesce.stale_successors(orders):
+            if o not in self._in_flight:
+                coalesce.abandon(o)
+        for action in coalesce.diff(orders):
+            o, old = action.order, action.replaces
+            # one request per order at a time; whatever the adjuster wants
+            # next is picked up on a later tick
+            if o in self._in_flight or old in self._in_flight:
+                self.stats["busy"] += 1
+                continue
+            if action.kind == coalesce.CANCEL:
+                coro = self._cancel(o)
+            elif action.kind == coalesce.POST:
+                coro = self._post(o)
+            else:
+                coro = self._replace(old, o)
+            task = asyncio.ensure_future(coro)
+            for busy in {o, old} - {None}:
+                self._in_flight[busy] = task
+                task.add_done_callback(
+                    lambda _, o=busy: self._in_flight.pop(o)
+                )
+
+    async def drain(self):
+        while self._in_flight:
+            await asyncio.gather(*list(self._in_flight.values()))
+
+    async def _post(self, o):
+        price, otype = o.desired_price, o.desired_type
+        o.posted = True
+        o.actual_price = price
+        o.type = otype
+        async with self._semaphore:
+            ok = await self.broker.post(o, price, otype)
+        self.stats["posts" if ok else "rejects"] += 1
+        if not ok:
+            o.posted = False
+            o.actual_price = None
+
+    async def _cancel(self, o):
+        async with self._semaphore:
+            ok = await self.broker.cancel(o)
+        if ok:
+            self.stats["cancels"] += 1
+            o.posted = False
+        # otherwise the order was filled before the cancel got there; the
+        # fill arrives through the fill stream
+
+    async def _replace(self, old, new):
+        replace = getattr(self.broker, "replace", None)
+        if replace is None:
+            async with self._semaphore:
+                ok = await self.broker.cancel(old)
+            if ok:
+                self.stats["cancels"] += 1
+                old.posted = False
+                if (
+                    not new._to_cancel
+                    and new.desired_price is not None
+                    and coalesce.trim(new)
+                ):
+                    await self._post(new)
+                elif new is not old:
+                    coalesce.abandon(new)
+            elif new is not old:
+                coalesce.abandon(new)
+            return
+
+        price, otype = new.desired_price, new.desired_type
+        new.posted = True
+        async with self._semaphore:
+            # old may have been filled while the replace waited its turn
+            if coalesce.trim(new):
+                ok = await replace(old, new, price, otype)
+            else:
+                new.posted = False
+                coalesce.abandon(new)
+                ok = None
+        if ok is None:
+            await self._cancel(old)
+            return
+        if not ok:
+            # old was filled (or cancelled) before the replace got there
+            self.stats["rejects"] += 1
+            if new is not old:
+                new.posted = False
+                coalesce.abandon(new)
+            return
+        self.stats["replaces"] += 1
+        if new is not old:
+            old.posted = False
+        new.actual_price = price
+        new.type = otype
+
+    async def _apply_fills(self):
+        async for o, amount, price in self.broker.fills():
+            self.stats["fills"] += 1
+            o.filled += amount
+            if o.filled >= o.amount:
+                o.completed = True
+                o.posted = False
+
+
+# in-process broker with fixed round-trip latencies; posted orders fill
+# completely when a tick touches their price, like replay.SimBroker
+class FakeBroker:
+    def __init__(self, latency=0.001, cancel_latency=None):
+        self.latency = latency
+        self.cancel_latency = (
+            latency if cancel_latency is None else cancel_latency
+        )
+        self.live = {}
+        self.fill_notional = collections.Counter()
+        self.fill_amount = collections.Counter()
+        self._fills = asyncio.Queue()
+
+    async def post(self, o, price, otype):
+        await asyncio.sleep(self.latency)
+        self.live[o] = (price, otype)
+        return True
+
+    async def cancel(self, o):
+        await asyncio.sleep(self.cancel_latency)
+        return self.live.pop(o, None) is not None
+
+    async def replace(self, old, new, price, otype):
+        await asyncio.sleep(self.latency)
+        if self.live.pop(old, None) is None:
+            return False
+        self.live[new] = (price, otype)
+        return True
+
+    def on_tick(self, tick):
+        for o, (price, otype) in list(self.live.items()):
+            last = tick.get(o.asset)
+            if last is None:
+                continue
+            if otype == order.STOP_LOSS_ORDER:
+                hit = last >= price if o.is_buy() else last <= price
+                fill_price = last
+            else:
+                hit = last <= price if o.is_buy() else last >= price
+                fill_price = price
+            if hit:
+                del self.live[o]
+                amount = o.amount - o.filled
+                self.fill_amount[o.asset] += amount
+                self.fill_notional[o.asset] += amount * fill_price
+                self._fills.put_nowait((o, amount, fill_price))
+
+    async def fills(self):
+        while True:
+            yield await self._fills.get()
+
+
+# a broker without atomic replaces
+class FakeCancelBroker(FakeBroker):
+    replace = None
+
+
+async def run_fake(
+    rule,
+    path,
+    symbols,
+    start=0,
+    window=150,
+    verb="buy",
+    notional=10000,
+    latency=0.001,
+    cancel_latency=None,
+    period=0.0,
+    max_in_flight=8,
+    replace_orders=False,
+    atomic_replace=True,
+):
+    import replay
+
+    t = tape.load(path)
+    clock = replay._Clock(datetime.datetime(2000, 1, 1))
+    c = replay.SimContext(window * replay.TICK_PERIOD)
+    first = t.tick(start, symbols)
+    orders = [
+        replay.ORDER_CLASSES[verb](
+            a,
+            Decimal(math.floor(Decimal(notional) / first[a])),
+            first[a],
+            time_cb=clock,
+        )
+        for a in symbols
+    ]
+    adjuster = priceadjust.get_rules(rule)(c)
+    adjuster.REPLACE_ORDERS = replace_orders
+    adjuster.register(orders)
+    broker = (FakeBroker if atomic_replace else FakeCancelBroker)(
+        latency, cancel_latency
+    )
+    driver = AsyncDriver(adjuster, broker, max_in_flight)
+
+    async def ticks():
+        for tick in t.iter_ticks(start, start + window, symbols):
+            c.tick = tick
+            broker.on_tick(tick)
+            yield tick
+            clock.now += datetime.timedelta(seconds=replay.TICK_PERIOD)
+            await asyncio.sleep(period)
+
+    await driver.run(ticks())
+    return driver, broker, orders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a rule through the async driver and a fake broker."
+    )
+    parser.add_argument("tape", nargs="?", default="last_with_2s.csv")
+    parser.add_argument(
+        "-r", "--rule", choices=sorted(priceadjust._RULES), default="delta"
+    )
+    parser.add_argument("-s", "--symbol", action="append", required=True)
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--window", type=int, default=150)
+    parser.add_argument("--verb", choices=("buy", "sell"), default="buy")
+    parser.add_argument("--latency", type=float, default=0.001)
+    parser.add_argument("--cancel-latency", type=float)
+    parser.add_argument("--period", type=float, default=0.0)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="replace live orders instead of cancelling them first",
+    )
+    parser.add_argument(
+        "--no-atomic-replace",
+        action="store_true",
+        help="the broker only supports posts and cancels",
+    )
+    args = parser.parse_args(argv)
+
+    driver, broker, orders = asyncio.run(
+        run_fake(
+            args.rule,
+            args.tape,
+            args.symbol,
+            start=args.start,
+            window=args.window,
+            verb=args.verb,
+            latency=args.latency,
+            cancel_latency=args.cancel_latency,
+            period=args.period,
+            max_in_flight=args.max_in_flight,
+            replace_orders=args.replace,
+            atomic_replace=not args.no_atomic_replace,
+        )
+    )
+    for o in orders:
+        filled = broker.fill_amount[o.asset]
+        avg = broker.fill_notional[o.asset] / filled if filled else None
+        print(
+            "%s %s %d/%d avg %s (target %s)"
+            % (o.verb, o.asset, filled, o.amount, avg, o.target_price)
+        )
+    print(", ".join("%s=%d" % kv for kv in sorted(driver.stats.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import collections
+
+import priceadjust
+
+# event-driven delivery of ticks to a registered adjuster. Instead of
+# polling get_orders() with the whole basket at a fixed interval, the engine
+# hands every price update to on_tick() as it arrives:
+#
+#   trigger = EventTrigger(adjuster, threshold=0.0005, max_quiet=10)
+#   ... on every update (one or more assets -> last price):
+#   orders = trigger.on_tick(update)
+#   if orders is not None:
+#       send(orders)
+#   ... on fills, acks and cancels coming back from the broker:
+#   trigger.mark(asset)
+#
+# only the assets whose price moved more than their threshold (relative to
+# the price they were last evaluated at), that were marked or that have been
+# quiet for max_quiet seconds are re-evaluated; updates that don't touch
+# any of them don't call the adjuster at all. Rules that escalate with every
+# call would escalate with every burst of updates, so they escalate by the
+# clock instead (see _NewDelta.ESCALATION_PERIOD): escalation_period sets
+# the period on the adjuster, None keeps the adjuster's own or, if it has
+# none, uses ESCALATION_PERIOD
+
+
+class EventTrigger:
+    # seconds per escalation step for rules without a period of their own;
+    # the polling interval the rules were tuned with
+    ESCALATION_PERIOD = 2
+
+    def __init__(
+        self,
+        adjuster,
+        threshold=0,
+        thresholds=None,
+        max_quiet=None,
+        escalation_period=None,
+    ):
+        # threshold: relative price move that triggers a re-evaluation,
+        # thresholds: asset -> threshold of its own; max_quiet: seconds
+        # after which an asset is re-evaluated anyway, None never
+        self.adjuster = adjuster
+        self.threshold = threshold
+        self.thresholds = dict(thresholds or {})
+        self.max_quiet = max_quiet
+        if hasattr(adjuster, "ESCALATION_PERIOD"):
+            if escalation_period is None:
+                escalation_period = adjuster.ESCALATION_PERIOD
+            if escalation_period is None:
+                escalation_period = self.ESCALATION_PERIOD
+            adjuster.ESCALATION_PERIOD = escalation_period
+        self._reprice = priceadjust.needs_adjust(adjuster)
+        # last price of every asset seen so far
+        self.tick = {}
+        # asset -> (price, time) of its last evaluation
+        self._evaluated = {}
+        self._marked = set()
+        self.stats = collections.Counter()
+
+    def _now(self):
+        for o in self.adjuster._original_orders.values():
+            return o.time_cb()
+
+    # re-evaluate the asset with the next update, e.g. after a fill
+    def mark(self, *assets):
+        self._marked.update(assets)
+
+    def _moved(self, asset, price, last):
+        threshold = self.thresholds.get(asset, self.threshold)
+        return abs(price - last) / abs(last) > threshold
+
+    def _dirty(self, update, now):
+        assets = self.adjuster._original_orders
+        if self.max_quiet is None and len(self._evaluated) == len(assets):
+            # only what changed can be dirty
+            assets = [a for a in (*update, *self._marked) if a in assets]
+        dirty = set()
+        for asset in assets:
+            price = self.tick.get(asset)
+            if price is None:
+                continue
+            evaluated = self._evaluated.get(asset)
+            if (
+                evaluated is None
+                or asset in self._marked
+                or (
+                    asset in update and self._moved(asset, price, evaluated[0])
+                )
+                or (
+                    self.max_quiet is not None
+                    and (now - evaluated[1]).total_seconds() >= self.max_quiet
+                )
+            ):
+                dirty.add(asset)
+        return dirty
+
+    # update: asset -> last price for the assets that changed; returns the
+    # adjuster's orders, or None when nothing needed a re-evaluation
+    def on_tick(self, update):
+        self.tick.update(update)
+        now = self._now()
+        dirty = self._dirty(update, now)
+        self.stats["updates"] += 1
+        if not dirty:
+            self.stats["skipped"] += 1
+            return None
+        self._marked -= dirty
+        for asset in dirty:
+            self._evaluated[asset] = (self.tick[asset], now)
+        self.stats["evaluations"] += 1
+        self.stats["assets_evaluated"] += len(dirty)
+        orders = self.adjuster.get_orders(self.tick, dirty)
+        if self._reprice:
+            for o in orders:
+                if o.asset in dirty:
+                    self.adjuster.adjust(o, self.tick)
+        return orders
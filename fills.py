@@ -0,0 +1,127 @@
+from decimal import Decimal
+import random
+import zlib
+
+from blade import order
+
+# fill models for replay.SimBroker: given a live order and the last price of
+# its asset, how much of the order fills and at what price
+#
+#   broker = replay.SimBroker(fills.get_model("queue", seed=1))
+#
+# stop loss orders fill completely at the last price once it reaches their
+# price, in every model; the models differ in how limit orders fill:
+#
+#   touch    completely at the limit as soon as the last price reaches it
+#   through  completely at the limit once the last price trades through it,
+#            touching it isn't enough
+#   queue    the order joins a queue of random size at its price (again after
+#            every reprice); each tick the last price sits at the limit a
+#            random volume trades there, which works through the queue
+#            ahead of the order first and then fills it, possibly in part.
+#            Trading through the limit fills it completely
+#
+# models are deterministic given their seed: every asset draws from its own
+# random generator, so the order in which the broker goes through its
+# orders doesn't matter
+
+
+def _reached(o, last):
+    if o.is_buy():
+        return last <= o.actual_price
+    return last >= o.actual_price
+
+
+def _through(o, last):
+    if o.is_buy():
+        return last < o.actual_price
+    return last > o.actual_price
+
+
+class FillModel:
+    # o went live at its actual_price, as a new order or by a replace
+    def posted(self, o):
+        pass
+
+    # o left the book, cancelled or completely filled
+    def removed(self, o):
+        pass
+
+    # (amount, price) filled of the live order o at the last price, or None
+    def fill(self, o, last):
+        if o.type == order.STOP_LOSS_ORDER:
+            if o.is_buy():
+                triggered = last >= o.actual_price
+            else:
+                triggered = last <= o.actual_price
+            return (o.remaining, last) if triggered else None
+        return self._limit_fill(o, last)
+
+    def _limit_fill(self, o, last):
+        raise NotImplementedError
+
+
+class TouchFill(FillModel):
+    def _limit_fill(self, o, last):
+        if _reached(o, last):
+            return o.remaining, o.actual_price
+        return None
+
+
+class TradeThroughFill(FillModel):
+    def _limit_fill(self, o, last):
+        if _through(o, last):
+            return o.remaining, o.actual_price
+        return None
+
+
+class QueueFill(FillModel):
+    def __init__(self, seed=0, depth=300, volume=200):
+        # depth: mean number of shares ahead of an order when it goes live;
+        # volume: mean number of shares traded at the limit per tick the
+        # last price sits there. Both are exponentially distributed
+        self.seed = seed
+        self.depth = depth
+        self.volume = volume
+        self._rngs = {}
+        # live order -> shares still ahead of it
+        self._ahead = {}
+
+    def _rng(self, asset):
+        rng = self._rngs.get(asset)
+        if rng is None:
+            key = ("%s:%s" % (self.seed, asset)).encode()
+            rng = self._rngs[asset] = random.Random(zlib.crc32(key))
+        return rng
+
+    def posted(self, o):
+        self._ahead[o] = self._rng(o.asset).expovariate(1 / self.depth)
+
+    def removed(self, o):
+        self._ahead.pop(o, None)
+
+    def _limit_fill(self, o, last):
+        if _through(o, last):
+            return o.remaining, o.actual_price
+        if last != o.actual_price:
+            return None
+        traded = self._rng(o.asset).expovariate(1 / self.volume)
+        ahead = self._ahead.get(o, 0)
+        if traded <= ahead:
+            self._ahead[o] = ahead - traded
+            return None
+        self._ahead[o] = 0
+        amount = min(o.remaining, Decimal(int(traded - ahead)))
+        return (amount, o.actual_price) if amount > 0 else None
+
+
+MODELS = {
+    "touch": TouchFill,
+    "through": TradeThroughFill,
+    "queue": QueueFill,
+}
+
+
+def get_model(name, seed=0):
+    cls = MODELS[name]
+    return cls(seed) if cls is QueueFill else cls()
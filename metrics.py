@@ -0,0 +1,135 @@
+import collections
+import json
+import math
+import threading
+import time
+
+# metrics sinks for _Adjuster.set_metrics(); a sink needs two methods:
+#   observe(name, seconds) - a timing of one call of a timed method
+#   count(name, n)         - an event counter (orders_created, cancels,
+#                            negligent_changes)
+
+BUCKETS_PER_DECADE = 10
+MIN_SECONDS = 1e-7
+
+
+def _bucket(seconds):
+    return math.floor(
+        math.log10(max(seconds, MIN_SECONDS)) * BUCKETS_PER_DECADE
+    )
+
+
+def _bucket_bound(bucket):
+    return 10 ** ((bucket + 1) / BUCKETS_PER_DECADE)
+
+
+class _Timer:
+    __slots__ = ("n", "total", "max", "buckets")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = collections.Counter()
+
+    def observe(self, seconds):
+        self.n += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[_bucket(seconds)] += 1
+
+    # upper bound of the log-scaled bucket holding the q-th quantile
+    def percentile(self, q):
+        if not self.n:
+            return None
+        rank = q * self.n
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(_bucket_bound(bucket), self.max)
+        return self.max
+
+
+# in-memory log-scaled histograms; cheap enough to stay attached in
+# production and be inspected / logged periodically
+class HistogramSink:
+    def __init__(self):
+        self.timers = collections.defaultdict(_Timer)
+        self.counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.timers[name].observe(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def percentile(self, name, q):
+        return self.timers[name].percentile(q)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "timers": {
+                    name: {
+                        "n": t.n,
+                        "mean": t.total / t.n if t.n else None,
+                        "p50": t.percentile(0.5),
+                        "p99": t.percentile(0.99),
+                        "max": t.max,
+                    }
+                    for name, t in self.timers.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.timers.clear()
+            self.counters.clear()
+
+
+# one JSON object per timing / counter increment, for offline analysis;
+# writes are buffered by the file object, call flush() or close() to make
+# sure everything is on disk
+class JsonLinesSink:
+    def __init__(self, path):
+        self._f = open(path, "a")
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._f.write(line + "\n")
+
+    def observe(self, name, seconds):
+        self._write({"ts": time.time(), "timer": name, "seconds": seconds})
+
+    def count(self, name, n=1):
+        self._write({"ts": time.time(), "counter": name, "n": n})
+
+    def flush(self):
+        with self._lock:
+            self._f.flush()
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+# forward to several sinks at once
+class TeeSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def observe(self, name, seconds):
+        for sink in self.sinks:
+            sink.observe(name, seconds)
+
+    def count(self, name, n=1):
+        for sink in self.sinks:
+            sink.count(name, n)
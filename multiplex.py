@@ -0,0 +1,265 @@
+import argparse
+import collections
+import concurrent.futures
+import datetime
+from decimal import Decimal
+import math
+
+import netting
+import priceadjust
+import tape
+
+
+def _evaluate(adjuster, reprice, tick):
+    orders = adjuster.get_orders(tick)
+    if reprice:
+        for o in orders:
+            adjuster.adjust(o, tick)
+    return orders
+
+
+def _resting(o):
+    # at the broker and staying where it is
+    return (
+        o.posted
+        and not o._to_cancel
+        and o.desired_price == o.actual_price
+        and o.type == o.desired_type
+    )
+
+
+# runs several registered adjusters (one per basket, any mix of rules) over
+# one tick stream; to the caller it looks like a single adjuster whose
+# get_orders() hands out the orders of all baskets, already adjusted.
+#
+# Baskets are evaluated one after the other. With workers > 1 they are
+# evaluated on a thread pool instead, which only pays off when the engine
+# context blocks (quotes, amounts), and only works when the context can be
+# called concurrently by the adjusters sharing it; it is opt-in for that
+# reason.
+#
+# Orders of different baskets in the same asset must not trade against each
+# other: a buy at or above a sell of another basket is held back for the
+# tick (its desired price is reset, so nothing is sent) and the basket
+# re-evaluates it on the next one. Orders resting at the broker go first,
+# then baskets in the order they were given.
+class Multiplexer:
+    def __init__(self, adjusters, workers=1):
+        # name -> registered adjuster
+        self.adjusters = dict(adjusters)
+        self._reprice = {
+            name: priceadjust.needs_adjust(a)
+            for name, a in self.adjusters.items()
+        }
+        self._executor = (
+            concurrent.futures.ThreadPoolExecutor(workers)
+            if workers > 1
+            else None
+        )
+        self.stats = collections.Counter()
+        # name -> orders handed out on the last tick
+        self.orders = {}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def get_orders(self, tick):
+        names = list(self.adjusters)
+        if self._executor is None:
+            results = [
+                _evaluate(self.adjusters[n], self._reprice[n], tick)
+                for n in names
+            ]
+        else:
+            futures = [
+                self._executor.submit(
+                    _evaluate, self.adjusters[n], self._reprice[n], tick
+                )
+                for n in names
+            ]
+            results = [f.result() for f in futures]
+        self.orders = dict(zip(names, results))
+        self._prevent_self_trades(results)
+        merged = set()
+        for orders in results:
+            merged |= orders
+        return merged
+
+    def _prevent_self_trades(self, results):
+        by_asset = collections.defaultdict(list)
+        for basket, orders in enumerate(results):
+            for o in orders:
+                if o.completed or o._to_cancel or o.desired_price is None:
+                    continue
+                by_asset[o.asset].append((not _resting(o), basket, o))
+        for candidates in by_asset.values():
+            if len({o.verb for _, _, o in candidates}) < 2:
+                continue
+            candidates.sort(key=lambda c: c[:2])
+            # per side: basket -> best accepted price
+            best_buy = {}
+            best_sell = {}
+            for _, basket, o in candidates:
+                price = o.desired_price
+                if o.is_buy():
+                    crosses = any(
+                        b != basket and p <= price
+                        for b, p in best_sell.items()
+                    )
+                    best = best_buy
+                    better = max
+                else:
+                    crosses = any(
+                        b != basket and p >= price for b, p in best_buy.items()
+                    )
+                    best = best_sell
+                    better = min
+                if crosses:
+                    self._hold_back(o)
+                else:
+                    best[basket] = (
+                        price
+                        if basket not in best
+                        else better(best[basket], price)
+                    )
+
+    def _hold_back(self, o):
+        self.stats["self_trades_prevented"] += 1
+        # a posted order keeps resting where it is, a new one isn't sent
+        o.desired_price = o.actual_price if o.posted else None
+        o.desired_type = o.type
+
+
+def run_tape(
+    baskets, path, start=0, window=150, workers=1, spread=1, net=None
+):
+    # baskets: (rule, verb, symbols) per basket; all baskets are driven by a
+    # single SimBroker. With net set to a rule, the baskets are netted first
+    # and only the residual is traded, by that rule
+    import replay
+
+    t = tape.load(path)
+    symbols = sorted({s for _, _, symbols in baskets for s in symbols})
+    clock = replay._Clock(datetime.datetime(2000, 1, 1))
+    c = replay.SimContext(window * replay.TICK_PERIOD, spread)
+    first = t.tick(start, symbols)
+    adjusters = {}
+    originals = {}
+    for n, (rule, verb, basket_symbols) in enumerate(baskets):
+        orders = [
+            replay.ORDER_CLASSES[verb](
+                s,
+                Decimal(math.floor(Decimal(10000) / first[s])),
+                first[s],
+                time_cb=clock,
+            )
+            for s in basket_symbols
+        ]
+        name = "%d:%s" % (n, rule)
+        originals[name] = orders
+        if net is None:
+            adjusters[name] = priceadjust.get_rules(rule)(c)
+            adjusters[name].register(orders)
+    netted = None
+    if net is not None:
+        netted = netting.Netting(originals)
+        adjusters["net:%s" % net] = priceadjust.get_rules(net)(c)
+        adjusters["net:%s" % net].register(netted.residual)
+
+    mux = Multiplexer(adjusters, workers)
+    broker = replay.SimBroker()
+    # name -> every order the basket handed out
+    handed_out = collections.defaultdict(set)
+    try:
+        for tick in t.iter_ticks(start, start + window, symbols):
+            c.tick = tick
+            broker.match(tick)
+            broker.sync(mux.get_orders(tick))
+            for name, orders in mux.orders.items():
+                handed_out[name] |= orders
+            clock.now += datetime.timedelta(seconds=replay.TICK_PERIOD)
+    finally:
+        mux.close()
+    if netted is None:
+        filled = {
+            name: sum(o.filled for o in handed_out[name]) for name in adjusters
+        }
+    else:
+        # residual fills are only known per child order; put them on the
+        # residual orders before settling
+        by_asset = collections.Counter()
+        for orders in handed_out.values():
+            for o in orders:
+                if o not in netted.residual:
+                    by_asset[o.asset] += o.filled
+        for o in netted.residual:
+            o.filled = min(o.amount, by_asset[o.asset])
+        settled = netted.settle()
+        filled = {
+            name: sum(settled.get(o, (0, 0))[0] for o in orders)
+            for name, orders in originals.items()
+        }
+    return mux, broker, originals, filled, netted
+
+
+def _parse_basket(spec):
+    # rule:verb:SYM,SYM,...
+    rule, verb, symbols = spec.split(":")
+    return rule, verb, symbols.split(",")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run several baskets over one tick stream."
+    )
+    parser.add_argument("tape", nargs="?", default="last_with_2s.csv")
+    parser.add_argument(
+        "-b",
+        "--basket",
+        action="append",
+        required=True,
+        type=_parse_basket,
+        help="rule:verb:SYM,SYM,...",
+    )
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--window", type=int, default=150)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="evaluate the baskets on this many threads",
+    )
+    parser.add_argument(
+        "--net",
+        choices=sorted(priceadjust._RULES),
+        help="net the baskets and trade the residual with this rule",
+    )
+    args = parser.parse_args(argv)
+
+    mux, broker, originals, filled, netted = run_tape(
+        args.basket,
+        args.tape,
+        args.start,
+        args.window,
+        args.workers,
+        net=args.net,
+    )
+    for name, orders in originals.items():
+        total = sum(o.amount for o in orders)
+        print("%s %d/%d" % (name, filled[name], total))
+    print(
+        "cancels=%d replaces=%d self_trades_prevented=%d"
+        % (
+            broker.cancels,
+            broker.replaces,
+            mux.stats["self_trades_prevented"],
+        )
+    )
+    if netted is not None:
+        print("crossed internally: %d" % netted.crossed_amount())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import collections
+from decimal import Decimal
+
+# nets the orders of several baskets per asset before they are registered
+# with a rule: opposing buys and sells are crossed internally and only the
+# net residual per asset goes to the market
+#
+#   netting = Netting({"basket1": orders1, "basket2": orders2})
+#   adjuster.register(netting.residual)
+#   ...
+#   netting.settle()  # fills of the residual go back to the baskets
+
+# amount of a basket order crossed internally at price
+Cross = collections.namedtuple("Cross", "order amount price")
+
+
+def _vwap(parts):
+    amount = sum(a for _, a in parts)
+    return sum(o.target_price * a for o, a in parts) / amount
+
+
+class Netting:
+    def __init__(self, baskets, prices=None):
+        # name -> orders; prices optionally maps assets to the price crosses
+        # are done at, by default the midpoint of both sides' targets
+        self.baskets = {name: list(orders) for name, orders in baskets.items()}
+        self.crosses = []
+        self.residual = []
+        # residual order -> [(basket order, amount)] it stands for
+        self._parts = {}
+        self._net(prices or {})
+
+    def _net(self, prices):
+        by_asset = collections.defaultdict(lambda: ([], []))
+        for orders in self.baskets.values():
+            for o in orders:
+                if o.amount > 0:
+                    by_asset[o.asset][0 if o.is_buy() else 1].append(o)
+
+        for asset, (buys, sells) in by_asset.items():
+            crossed = min(
+                sum(o.amount for o in buys), sum(o.amount for o in sells)
+            )
+            if crossed:
+                price = prices.get(asset)
+                if price is None:
+                    price = (
+                        _vwap([(o, o.amount) for o in buys])
+                        + _vwap([(o, o.amount) for o in sells])
+                    ) / 2
+                buys = self._cross(buys, crossed, price)
+                sells = self._cross(sells, crossed, price)
+            for side in (buys, sells):
+                if side:
+                    self._add_residual(side)
+
+    # cross amount of the orders (first come, first served); returns what is
+    # left of them as (order, amount)
+    def _cross(self, orders, amount, price):
+        left = []
+        for o in orders:
+            take = min(o.amount, amount)
+            if take:
+                self.crosses.append(Cross(o, take, price))
+                amount -= take
+            if o.amount > take:
+                left.append((o, o.amount - take))
+        return left
+
+    def _add_residual(self, parts):
+        parts = [p if isinstance(p, tuple) else (p, p.amount) for p in parts]
+        if len(parts) == 1 and parts[0][1] == parts[0][0].amount:
+            # a single untouched order goes to the market as it is
+            o = parts[0][0]
+        else:
+            first = parts[0][0]
+            o = first.__class__(
+                first.asset,
+                sum(a for _, a in parts),
+                _vwap(parts),
+                time_cb=first.time_cb,
+            )
+        self._parts[o] = parts
+        self.residual.append(o)
+
+    def crossed_amount(self, asset=None):
+        return sum(
+            c.amount
+            for c in self.crosses
+            if asset is None or c.order.asset == asset
+        ) / Decimal(2)
+
+    # basket order -> (filled, notional): the internal crosses plus its share
+    # of what the residual orders filled so far (first come, first served,
+    # at the residual's average price when notional is known)
+    def settle(self, residual_notional=None):
+        residual_notional = residual_notional or {}
+        result = collections.defaultdict(lambda: [Decimal(0), Decimal(0)])
+        for c in self.crosses:
+            result[c.order][0] += c.amount
+            result[c.order][1] += c.amount * c.price
+        for o, parts in self._parts.items():
+            filled = o.filled
+            notional = residual_notional.get(o)
+            price = notional / filled if filled and notional else None
+            for part, amount in parts:
+                take = min(filled, amount)
+                filled -= take
+                result[part][0] += take
+                if price is not None:
+                    result[part][1] += take * price
+        return {o: tuple(v) for o, v in result.items()}
@@ -1,36 +1,758 @@
 import abc
 import collections
-from decimal import Decimal
+import datetime
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+import functools
+import logging
 import math
+import os
+import time
 
 from blade import config
 from blade import order
 
 
+# snapshot of the parameters of a config section; values are read once and
+# kept as plain attributes so that hot paths don't go through config parsing
+# on every access
+class _Params:
+    def __init__(self, section, factories, path=None, overrides=None):
+        self._section = section
+        self._factories = factories
+        self._path = path
+        self._overrides = overrides or {}
+        self._mtime = None
+        self.reload()
+
+    def _get_mtime(self):
+        if self._path is None:
+            return None
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        self._mtime = self._get_mtime()
+        for key, factory in self._factories.items():
+            if key in self._overrides:
+                value = factory(self._overrides[key])
+            else:
+                value = config.get_from_config(
+                    key=key, section=self._section, factory=factory
+                )
+            setattr(self, key, value)
+
+    def reload_if_changed(self):
+        if self._path is None or self._get_mtime() == self._mtime:
+            return False
+        self.reload()
+        return True
+
+
+# rolling price statistics of a single asset, updated in O(1) per tick:
+# a ring buffer of returns with a running mean / variance, an EWMA of the
+# squared returns and the prices needed for short horizon returns
+class _AssetStats:
+    __slots__ = (
+        "prices",
+        "returns",
+        "sum",
+        "sumsq",
+        "ewma_var",
+        "alpha",
+        "delta",
+    )
+
+    def __init__(self, window, alpha):
+        self.prices = collections.deque(maxlen=window + 1)
+        self.returns = collections.deque(maxlen=window)
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.ewma_var = None
+        self.alpha = alpha
+        # (price, target price, verb, delta) of the last delta computed
+        self.delta = None
+
+    def update(self, price):
+        price = float(price)
+        if self.prices:
+            r = price / self.prices[-1] - 1
+            if len(self.returns) == self.returns.maxlen:
+                old = self.returns[0]
+                self.sum -= old
+                self.sumsq -= old * old
+            self.returns.append(r)
+            self.sum += r
+            self.sumsq += r * r
+            if self.ewma_var is None:
+                self.ewma_var = r * r
+            else:
+                self.ewma_var += self.alpha * (r * r - self.ewma_var)
+        self.prices.append(price)
+
+    @property
+    def mean(self):
+        return self.sum / len(self.returns) if self.returns else 0.0
+
+    @property
+    def variance(self):
+        n = len(self.returns)
+        if n < 2:
+            return 0.0
+        return max(0.0, (self.sumsq - self.sum * self.sum / n) / (n - 1))
+
+    @property
+    def ewma_vol(self):
+        return math.sqrt(self.ewma_var) if self.ewma_var else 0.0
+
+    # return over the last n ticks (or as many as there are)
+    def ret(self, n=1):
+        if len(self.prices) < 2:
+            return 0.0
+        n = min(n, len(self.prices) - 1)
+        return self.prices[-1] / self.prices[-1 - n] - 1
+
+
+class _RollingStats:
+    def __init__(self, window, halflife):
+        self.window = window
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self._assets = {}
+
+    def __getitem__(self, asset):
+        s = self._assets.get(asset)
+        if s is None:
+            s = self._assets[asset] = _AssetStats(self.window, self.alpha)
+        return s
+
+    def get(self, asset):
+        return self._assets.get(asset)
+
+    def update(self, tick, assets):
+        for asset in assets:
+            price = tick.get(asset)
+            if price is not None:
+                self[asset].update(price)
+
+
+# adjuster-internal child order that hasn't been queued yet; candidates are
+# built for every asset on every tick but most of them are only compared
+# against the live order and thrown away, so they are small fixed-layout
+# records that support what adjust() needs and are only turned into engine
+# orders (materialize()) by _add_pending_order()
+class _Intent:
+    __slots__ = (
+        "orig_order",
+        "asset",
+        "verb",
+        "amount",
+        "type",
+        "desired_price",
+        "flags",
+        "_to_cancel",
+        "_stop_loss",
+    )
+
+    def __init__(self, orig_order, amount, otype=None, stop_loss=None):
+        self.orig_order = orig_order
+        self.asset = orig_order.asset
+        self.verb = orig_order.verb
+        self.amount = amount
+        # None leaves the order type to the order class
+        self.type = otype
+        self.desired_price = None
+        self.flags = None
+        self._to_cancel = False
+        # None leaves _stop_loss unset on the materialized order
+        self._stop_loss = stop_loss
+
+    def is_buy(self):
+        return self.verb == "buy"
+
+    def is_sell(self):
+        return self.verb == "sell"
+
+    def add_flag(self, flag):
+        if self.flags is None:
+            self.flags = set()
+        self.flags.add(flag)
+
+    def remove_flag(self, flag):
+        if self.flags is not None:
+            self.flags.discard(flag)
+
+    def materialize(self):
+        orig_order = self.orig_order
+        if self.type is None:
+            o = orig_order.__class__(
+                self.asset,
+                self.amount,
+                orig_order.target_price,
+                time_cb=orig_order.time_cb,
+            )
+        else:
+            o = orig_order.__class__(
+                self.asset,
+                self.amount,
+                orig_order.target_price,
+                time_cb=orig_order.time_cb,
+                otype=self.type,
+            )
+        o.desired_price = self.desired_price
+        if self._to_cancel:
+            o._to_cancel = True
+        if self._stop_loss is not None:
+            o._stop_loss = self._stop_loss
+        for flag in self.flags or ():
+            o.add_flag(flag)
+        return o
+
+
+# price grid of a tick size: prices are rounded to whole ticks with a
+# single quantize to the tick's decimal exponent (exact, no float or
+# multiply / divide round trip) and, for ticks that aren't a power of ten
+# (e.g. 0.05), integer arithmetic on the number of ticks
+class _TickGrid:
+    __slots__ = ("size", "quantum", "exp", "step")
+
+    _grids = {}
+
+    def __init__(self, size):
+        size = Decimal(size)
+        _, _, exp = size.normalize().as_tuple()
+        self.size = size
+        self.quantum = Decimal(1).scaleb(exp)
+        self.exp = exp
+        # tick size in units of the quantum
+        self.step = int(size.scaleb(-exp))
+
+    @classmethod
+    def get(cls, size):
+        grid = cls._grids.get(size)
+        if grid is None:
+            grid = cls._grids[size] = cls(size)
+        return grid
+
+    # price as a whole number of ticks, rounded down or up
+    def to_ticks(self, price, up=False):
+        units = int(
+            price.quantize(
+                self.quantum, ROUND_CEILING if up else ROUND_FLOOR
+            ).scaleb(-self.exp)
+        )
+        if up:
+            return -(-units // self.step)
+        return units // self.step
+
+    def from_ticks(self, ticks):
+        return Decimal(ticks * self.step).scaleb(self.exp)
+
+    def floor(self, price):
+        if self.step == 1:
+            return price.quantize(self.quantum, ROUND_FLOOR)
+        return self.from_ticks(self.to_ticks(price))
+
+    def ceil(self, price):
+        if self.step == 1:
+            return price.quantize(self.quantum, ROUND_CEILING)
+        return self.from_ticks(self.to_ticks(price, up=True))
+
+
+# quotes of one tick: c.ticker() and the bid / ask of each asset are fetched
+# from the engine at most once and then shared by every adjust() and sizing
+# call until the next get_orders(). When the engine context offers
+# get_quotes(assets) -> {asset: (bid, ask)}, the first bid or ask lookup
+# fetches all assets with it in one go; rules that never look at quotes
+# don't fetch any. hits / misses count lookups served from the snapshot and
+# round trips to the engine
+class _Quotes:
+    __slots__ = (
+        "c",
+        "taken_at",
+        "max_age",
+        "hits",
+        "misses",
+        "_ticker",
+        "_batch",
+    )
+
+    def __init__(self, c, assets=(), max_age=None):
+        self.c = c
+        self.taken_at = time.monotonic()
+        # seconds after which the snapshot is refetched; None keeps it for
+        # the whole tick
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._ticker = {}
+        # assets still to be fetched with c.get_quotes()
+        self._batch = None
+        if getattr(c, "get_quotes", None) is not None:
+            self._batch = list(assets) or None
+
+    def _fetch_batch(self):
+        assets, self._batch = self._batch, None
+        self.misses += 1
+        for asset, (bid, ask) in self.c.get_quotes(assets).items():
+            self._ticker[("bid", asset)] = bid
+            self._ticker[("ask", asset)] = ask
+
+    @property
+    def age(self):
+        return time.monotonic() - self.taken_at
+
+    @property
+    def stale(self):
+        return self.max_age is not None and self.age > self.max_age
+
+    def _get(self, key, fetch, *args):
+        if self.stale:
+            self._ticker.clear()
+            self.taken_at = time.monotonic()
+        value = self._ticker.get(key)
+        if value is None:
+            self.misses += 1
+            value = self._ticker[key] = fetch(*args)
+        else:
+            self.hits += 1
+        return value
+
+    # asset -> (bid, ask) of what was fetched so far
+    def bid_ask(self):
+        quotes = {}
+        for key, value in list(self._ticker.items()):
+            if key != "ticker":
+                side, asset = key
+                quotes.setdefault(asset, [None, None])[side == "ask"] = value
+        return quotes
+
+    def ticker(self):
+        return self._get("ticker", self.c.ticker)
+
+    def get_bid(self, asset):
+        if self._batch is not None:
+            self._fetch_batch()
+        return self._get(("bid", asset), self.c.get_bid, asset)
+
+    def get_ask(self, asset):
+        if self._batch is not None:
+            self._fetch_batch()
+        return self._get(("ask", asset), self.c.get_ask, asset)
+
+
+def _timed(metrics, name, method):
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.observe(name, time.perf_counter() - start)
+
+    return timed
+
+
 class _Adjuster(abc.ABC):
+    # config file to watch for changes; when set, parameter snapshots are
+    # reloaded as soon as the file is modified, otherwise only on register()
+    CONFIG_PATH = None
+    # methods timed while a metrics sink is attached
+    TIMED_METHODS = ("register", "get_orders", "adjust", "_to_trade")
+
+    # log lines below this level are neither formatted nor passed to c.log;
+    # registration lines are INFO, per-tick progress lines are DEBUG
+    LOG_LEVEL = logging.DEBUG
+    # only log the progress of an asset when its fill state changed
+    LOG_CHANGES_ONLY = False
+    # rolling statistics: ticks of history and EWMA half-life (in ticks).
+    # They are only kept with WILD_MOVE_STATS, or with ROLLING_STATS for
+    # other code reading self.stats
+    STATS_WINDOW = 30
+    STATS_HALFLIFE = 10
+    ROLLING_STATS = False
+    # with WILD_MOVE_STATS, a move of more than WILD_MOVE_SIGMAS EWMA
+    # volatilities (and at least WILD_MOVE_MIN_RETURN) over WILD_MOVE_HORIZON
+    # ticks against the order is wild as well, once STATS_WINDOW ticks were
+    # seen; otherwise (and always) the engine decides
+    WILD_MOVE_STATS = False
+    WILD_MOVE_SIGMAS = 4
+    WILD_MOVE_MIN_RETURN = 0.001
+    WILD_MOVE_HORIZON = 3
+    # replace live orders that need to change instead of cancelling them and
+    # posting the successor once the cancel went through; the successor is
+    # queued in the same tick and linked to the order it replaces through
+    # _replaces, which the caller has to honour (see coalesce.py), so this is
+    # only safe with a driver that does. Replaces of an asset are at least
+    # REPLACE_MIN_INTERVAL seconds apart, changes in between are ignored
+    REPLACE_ORDERS = False
+    REPLACE_MIN_INTERVAL = 0
+    # price grid: TICK_SIZE, or SUB_PENNY_TICK_SIZE for prices below
+    # SUB_PENNY_BELOW (None: never, e.g. Decimal(1) for US equities);
+    # TICK_SIZES maps assets to a tick size of their own
+    TICK_SIZE = Decimal("0.01")
+    SUB_PENNY_TICK_SIZE = Decimal("0.0001")
+    SUB_PENNY_BELOW = None
+    TICK_SIZES = {}
+    # seconds a tick's quote snapshot is used for before it is refetched;
+    # None uses it until the next tick
+    QUOTES_MAX_AGE = None
+    # the rule's own state saved in checkpoints (see checkpoint.py) on top of
+    # the orders; dicts are saved as plain dicts and restored in place
+    CHECKPOINT_ATTRS = ("_replaced_at",)
+    # rules sizing every asset on every tick (delta, newdelta) only
+    # re-evaluate the assets whose state changed since they were last looked
+    # at: price, fills, orders acked or cancelled, or the remaining time
+    # moving into another INCREMENTAL_TIME_BUCKET (seconds). The others keep
+    # their orders as they are, which means the slow drift of the sizing
+    # curve with time is only picked up once per bucket
+    INCREMENTAL = False
+    INCREMENTAL_TIME_BUCKET = 10
+    # fix the column of every asset at register() (self.columns), for
+    # engines handing out arraytick.ArrayTick ticks (needs numpy)
+    ARRAY_TICKS = False
+    # whether the rule looks up bid / ask quotes at all; callers that fetch
+    # quotes on its behalf (see shard.py) skip them when it doesn't
+    USES_QUOTES = True
+
     def __init__(self, c):
         self.c = c
+        self.metrics = None
+        self._progress = {}
+        self.stats = _RollingStats(self.STATS_WINDOW, self.STATS_HALFLIFE)
         self.all_orders = set()
         self.pending_orders = []
+        # asset -> original order; asset -> live (not yet accounted for)
+        # pending orders in the order they were created
+        self._original_orders = {}
+        self._live_orders = {}
+        # asset -> time of the last replace
+        self._replaced_at = {}
+        # asset -> state it was last evaluated in (see INCREMENTAL)
+        self._evaluated_state = {}
+        self.columns = None
+        self.quotes = _Quotes(c, max_age=self.QUOTES_MAX_AGE)
+        # recorder.TapeRecorder capturing the ticks and quotes seen
+        self.recorder = None
 
     def register(self, orders):
         for o in orders:
-            self.c.log(
-                "To %s: %d %s @ %f"
-                % (o.verb, o.amount, o.asset, o.target_price)
+            self._log(
+                logging.INFO,
+                "To %s: %d %s @ %f",
+                o.verb,
+                o.amount,
+                o.asset,
+                o.target_price,
             )
+        self._progress = {}
+        self.stats = _RollingStats(self.STATS_WINDOW, self.STATS_HALFLIFE)
+        self._refresh_quotes(o.asset for o in orders)
         self.all_orders = orders
-
-    def get_orders(self, tick):
+        self._original_orders = {}
+        for o in orders:
+            self._original_orders.setdefault(o.asset, o)
+        self._live_orders = {}
+        self._replaced_at = {}
+        self._evaluated_state = {}
+        self.columns = None
+        if self.ARRAY_TICKS:
+            import arraytick
+
+            self.columns = arraytick.Columns(self._original_orders.values())
+
+    # assets, when given, are the only assets whose orders need to be looked
+    # at again (see events.py); the orders of the others are handed out as
+    # they are. Callers have to adjust() every order handed out by this
+    # get_orders() themselves, see needs_adjust()
+    def get_orders(self, tick, assets=None):
+        self._start_tick(tick, assets)
         return {o for o in self.all_orders if o.amount > 0}
 
+    # pick up where a checkpoint left off: register the original orders as
+    # usual, then put back the orders and state the rule had built up
+    # (rolling statistics start over)
+    def _restore(self, orders, all_orders, pending_orders, attrs):
+        self.register(orders)
+        self.all_orders = all_orders
+        self.pending_orders = []
+        self._live_orders = {}
+        for o in pending_orders:
+            self.pending_orders.append(o)
+            self._live_orders.setdefault(o.asset, []).append(o)
+        for name, value in attrs.items():
+            current = getattr(self, name, None)
+            if isinstance(current, dict):
+                current.clear()
+                current.update(value)
+            else:
+                setattr(self, name, value)
+
+    def _start_tick(self, tick, assets=None):
+        if assets is None:
+            assets = self._original_orders
+        self._update_stats(tick, assets)
+        self._refresh_quotes(assets)
+        if self.recorder is not None:
+            self.recorder.record(tick, self.quotes)
+
+    def _update_stats(self, tick, assets):
+        if self.WILD_MOVE_STATS or self.ROLLING_STATS:
+            self.stats.update(tick, assets)
+
+    def _refresh_quotes(self, assets):
+        q = self.quotes
+        if q.hits:
+            self._count("quote_hits", q.hits)
+        if q.misses:
+            self._count("quote_misses", q.misses)
+        self.quotes = _Quotes(self.c, assets, self.QUOTES_MAX_AGE)
+
+    def _is_wild_price_move(self, asset, is_buy):
+        if self.c.is_wild_price_move(asset, is_buy):
+            return True
+        if not self.WILD_MOVE_STATS:
+            return False
+        s = self.stats.get(asset)
+        if s is None or len(s.returns) < self.STATS_WINDOW:
+            return False
+        move = s.ret(self.WILD_MOVE_HORIZON)
+        if not is_buy:
+            move = -move
+        threshold = (
+            self.WILD_MOVE_SIGMAS
+            * s.ewma_vol
+            * math.sqrt(self.WILD_MOVE_HORIZON)
+        )
+        return move > max(threshold, self.WILD_MOVE_MIN_RETURN)
+
+    # relative distance of the tick from the original order's target price
+    # in percent, positive when unfavourable; cached per asset until the
+    # price changes. Array ticks in the adjuster's columns have it for the
+    # whole basket already (see ARRAY_TICKS)
+    def _get_delta(self, asset, tick):
+        if self.columns is not None and (
+            getattr(tick, "columns", None) is self.columns
+        ):
+            return tick.delta_of(asset)
+        orig_order = self._get_original_order(asset)
+        price = tick[asset]
+        s = self.stats[asset]
+        if s.delta is not None:
+            cached_price, target_price, verb, delta = s.delta
+            if (
+                cached_price == price
+                and target_price == orig_order.target_price
+                and verb == orig_order.verb
+            ):
+                return delta
+        delta = (
+            (price - orig_order.target_price)
+            / orig_order.target_price
+            * Decimal(100)
+        )
+        if orig_order.verb == "sell":
+            delta = -delta
+        s.delta = (price, orig_order.target_price, orig_order.verb, delta)
+        return delta
+
+    def _tick_grid(self, asset, price):
+        size = self.TICK_SIZES.get(asset)
+        if size is None:
+            if (
+                self.SUB_PENNY_BELOW is not None
+                and price < self.SUB_PENNY_BELOW
+            ):
+                size = self.SUB_PENNY_TICK_SIZE
+            else:
+                size = self.TICK_SIZE
+        return _TickGrid.get(size)
+
+    # round a price to the asset's tick grid in favour of the order (down
+    # for buys, up for sells) or against it
+    def _adjust_to_better(self, asset, verb, price):
+        grid = self._tick_grid(asset, price)
+        return grid.ceil(price) if verb == "sell" else grid.floor(price)
+
+    def _adjust_to_worse(self, asset, verb, price):
+        grid = self._tick_grid(asset, price)
+        return grid.floor(price) if verb == "sell" else grid.ceil(price)
+
+    # attach a metrics sink (see metrics.py) or detach it with None; timing
+    # wrappers only exist on the instance while a sink is attached, so an
+    # adjuster without one runs the plain methods
+    def set_metrics(self, metrics):
+        for name in self.TIMED_METHODS:
+            self.__dict__.pop(name, None)
+        self.metrics = metrics
+        if metrics is None:
+            return
+        for name in self.TIMED_METHODS:
+            method = getattr(self, name, None)
+            if method is not None:
+                setattr(self, name, _timed(metrics, name, method))
+
+    def _log_enabled(self, level):
+        return level >= self.LOG_LEVEL
+
+    def _log(self, level, msg, *args):
+        if self._log_enabled(level):
+            self.c.log(msg % args)
+
+    def _log_progress(self, o):
+        if not self._log_enabled(logging.DEBUG):
+            return
+        if self.LOG_CHANGES_ONLY:
+            state = (o.filled, o.amount)
+            if self._progress.get(o.asset) == state:
+                return
+            self._progress[o.asset] = state
+        self.c.log(
+            "%s executed at: %.2f (%d/%d)"
+            % (o.asset, o.filled / o.amount * 100, o.filled, o.amount)
+        )
+
+    def _count(self, name, n=1):
+        if self.metrics is not None:
+            self.metrics.count(name, n)
+
+    def _cancel(self, o):
+        o.desired_price = None
+        if not o._to_cancel:
+            # only orders going into the cancelling state are counted
+            o._to_cancel = True
+            self._count("cancels")
+
+    # give up a live order in favour of new; returns the amount that is
+    # taken out of the market. Without REPLACE_ORDERS (or when the order
+    # isn't posted yet, or is already on its way out) the order is cancelled
+    # and new is dropped, to be posted on a later tick. A replacement is
+    # sized from what is left of the original order once the fills of its
+    # live orders (which aren't accounted for yet) are taken off; when
+    # nothing is left the order is only cancelled
+    def _change_order(self, old, new):
+        if not self.REPLACE_ORDERS or not old.posted or old._to_cancel:
+            self._cancel(old)
+            return old.amount
+        left = self._get_original_order(old.asset).remaining - sum(
+            o.filled for o in self._get_live_orders(old.asset)
+        )
+        if left <= 0:
+            self._cancel(old)
+            return old.amount
+        now = old.time_cb()
+        last = self._replaced_at.get(old.asset)
+        if (
+            last is not None
+            and (now - last).total_seconds() < self.REPLACE_MIN_INTERVAL
+        ):
+            self._count("replaces_deferred")
+            return 0
+        self._replaced_at[old.asset] = now
+        self._cancel(old)
+        new.amount = min(new.amount, left)
+        new = self._add_pending_order(new)
+        if new is not None:
+            new._replaces = old
+            # see coalesce.trim
+            new._replaces_filled = old.filled
+        self._count("replaces")
+        return 0
+
+    def _get_original_order(self, asset):
+        return self._original_orders.get(asset)
+
+    def _time_bucket(self):
+        return None
+
+    # what an asset's decision depends on; orders that are about to be
+    # dropped (abandoned or completed) don't count
+    def _asset_state(self, asset, tick, time_bucket):
+        return (
+            tick[asset],
+            self._get_original_order(asset).filled,
+            time_bucket,
+            tuple(
+                (o, o.posted, o.filled, o._to_cancel, o.actual_price, o.type)
+                for o in self._get_live_orders(asset)
+                if not o.completed and (o.posted or not o._to_cancel)
+            ),
+        )
+
+    # assets whose state changed since they were last evaluated
+    def _dirty_assets(self, tick):
+        time_bucket = self._time_bucket()
+        dirty = set()
+        for asset in self._original_orders:
+            state = self._evaluated_state.get(asset)
+            if state is None or state != self._asset_state(
+                asset, tick, time_bucket
+            ):
+                dirty.add(asset)
+        self._count("assets_skipped", len(self._original_orders) - len(dirty))
+        return dirty
+
+    def _remember_evaluated(self, assets, tick):
+        time_bucket = self._time_bucket()
+        for asset in self._original_orders if assets is None else assets:
+            self._evaluated_state[asset] = self._asset_state(
+                asset, tick, time_bucket
+            )
+
+    def _get_live_orders(self, asset):
+        return self._live_orders.get(asset, ())
+
+    # queue an order (or an _Intent, which is materialized first); returns
+    # the queued order
+    def _add_pending_order(self, o):
+        # orders without anything to trade are never handed out, so there is
+        # no point in keeping them around until the next tick
+        if o.amount <= 0:
+            return None
+        if isinstance(o, _Intent):
+            o = o.materialize()
+        self._count("orders_created")
+        self.pending_orders.append(o)
+        self._live_orders.setdefault(o.asset, []).append(o)
+        return o
+
+    def _account_for_completed_orders(self):
+        # completed and abandoned (cancelled before being posted) orders are
+        # accounted for and dropped; the live order index is rebuilt from
+        # what is left, so both stay proportional to the number of assets
+        # rather than growing with every tick
+        filled_assets = set()
+        pending_orders = []
+        self._live_orders = {}
+        for o in self.pending_orders:
+            if o._accounted_for:
+                continue
+            if o.completed or (o._to_cancel and not o.posted):
+                self._get_original_order(o.asset).filled += o.filled
+                if o.filled > 0:
+                    filled_assets.add(o.asset)
+                o._accounted_for = True
+            else:
+                pending_orders.append(o)
+                self._live_orders.setdefault(o.asset, []).append(o)
+        self.pending_orders = pending_orders
+        return filled_assets
+
     @abc.abstractmethod
     def adjust(self, o, tick):
         raise NotImplementedError
 
 
+# rules that keep their own child orders price them in get_orders; the rest
+# expect the caller to adjust every order they hand out
+def needs_adjust(adjuster):
+    return type(adjuster).get_orders is _Adjuster.get_orders
+
+
 # stick to target price
 class _Target(_Adjuster):
+    USES_QUOTES = False
+
     def adjust(self, o, tick):
         o.desired_price = self.c.adjust_price(o.asset, o.target_price)
 
@@ -39,6 +761,8 @@ class _Target(_Adjuster):
 # to avoid double buy / double sell
 # stick to ticker price
 class _Ticker(_Adjuster):
+    USES_QUOTES = False
+
     def adjust(self, o, tick):
         o.desired_price = self.c.adjust_price(o.asset, tick[o.asset])
 
@@ -54,52 +778,28 @@ class _AskBid(_Adjuster):
             return
         if o.is_sell():
             o.desired_price = self.c.adjust_price(
-                o.asset, self.c.get_bid(o.asset)
+                o.asset, self.quotes.get_bid(o.asset)
             )
         else:
             o.desired_price = self.c.adjust_price(
-                o.asset, self.c.get_ask(o.asset)
+                o.asset, self.quotes.get_ask(o.asset)
             )
 
     def _get_limit_order(self, asset):
-        for o in self.pending_orders:
-            if o.asset == asset and not o._accounted_for:
-                return o
-
-    def _get_original_order(self, asset):
-        for o in self.all_orders:
-            if o.asset == asset:
-                return o
-
-    def _account_for_completed_orders(self):
-        filled_assets = set()
-
-        def register_filled(asset, filled):
-            orig_order = self._get_original_order(asset)
-            orig_order.filled += filled
-            if filled > 0:
-                filled_assets.add(asset)
-
-        for o in set(self.pending_orders):
-            if not o._accounted_for:
-                if o.completed:
-                    register_filled(o.asset, o.filled)
-                    o._accounted_for = True
-                elif o._to_cancel and not o.posted:
-                    register_filled(o.asset, o.filled)
-                    self.pending_orders.remove(o)
+        for o in self._get_live_orders(asset):
+            return o
 
     def do_trade(self, o, tick):
         return True
 
-    def get_orders(self, tick):
+    def get_orders(self, tick, assets=None):
+        self._start_tick(tick, assets)
         self._account_for_completed_orders()
 
         for o in self.all_orders:
-            self.c.log(
-                "%s executed at: %.2f (%d/%d)"
-                % (o.asset, o.filled / o.amount * 100, o.filled, o.amount)
-            )
+            if assets is not None and o.asset not in assets:
+                continue
+            self._log_progress(o)
 
             if not self.do_trade(o, tick):
                 continue
@@ -109,12 +809,8 @@ class _AskBid(_Adjuster):
             orig_order = self._get_original_order(o.asset)
 
             # prepare the new order candidate
-            new_order = orig_order.__class__(
-                o.asset,
-                orig_order.remaining,
-                orig_order.target_price,
-                time_cb=orig_order.time_cb,
-                otype=order.LIMIT_ORDER,
+            new_order = _Intent(
+                orig_order, orig_order.remaining, otype=order.LIMIT_ORDER
             )
 
             # make sure the price we use to determine if we need to cancel
@@ -125,17 +821,18 @@ class _AskBid(_Adjuster):
             lo = self._get_limit_order(o.asset)
             if lo is None:
                 # post new order only if the old one is gone
-                self.pending_orders.append(new_order)
+                self._add_pending_order(new_order)
             else:
                 if lo.actual_price != new_order.desired_price:
                     # first cancel existing order
-                    lo.desired_price = None
-                    lo._to_cancel = True
+                    self._cancel(lo)
 
         return {o for o in self.pending_orders if o.amount > 0}
 
 
 class _WaitNSee(_AskBid):
+    CHECKPOINT_ATTRS = _AskBid.CHECKPOINT_ATTRS + ("_delta",)
+
     def register(self, orders):
         super().register(orders)
         self._delta = collections.defaultdict(lambda: None)
@@ -180,26 +877,95 @@ as2 = Decimal(1)
 mul = Decimal("1.0")
 
 
+# one layer of _DynLayers: its share of the order, its price skew relative
+# to the last price and whether it is posted as a stop loss order
+_Layer = collections.namedtuple("_Layer", "layer weight skew stop_loss")
+
+
+# layer table of _DynLayers, with everything the layer decisions look up
+# precomputed; layers are in order of preference
+class _LayerPlan:
+    def __init__(self, layers, stop_loss_to_limit_layer):
+        self.layers = tuple(layers)
+        self.order = tuple(l.layer for l in self.layers)
+        if len(set(self.order)) != len(self.order):
+            raise ValueError("duplicate layers in %r" % (self.order,))
+        self.weights = {l.layer: l.weight for l in self.layers}
+        self.skews = {l.layer: Decimal(1) + l.skew for l in self.layers}
+        self.stop_loss_layers = frozenset(
+            l.layer for l in self.layers if l.stop_loss
+        )
+        self.limit_layers = frozenset(self.order) - self.stop_loss_layers
+        self.highest_limit_layer = max(self.limit_layers)
+        # the next layer up; layer numbers don't have to be contiguous
+        numbers = sorted(self.order)
+        self.next_layer = dict(zip(numbers, numbers[1:]))
+        self.stop_loss_to_limit_layer = stop_loss_to_limit_layer
+        if (
+            self.stop_loss_layers
+            and stop_loss_to_limit_layer not in self.limit_layers
+        ):
+            raise ValueError(
+                "stop_loss_to_limit_layer %r is not a limit layer"
+                % (stop_loss_to_limit_layer,)
+            )
+        self.order_types = {
+            l.layer: (
+                order.STOP_LOSS_ORDER if l.stop_loss else order.LIMIT_ORDER
+            )
+            for l in self.layers
+        }
+
+    # "layer:weight:skew[:stop], ..." as in the layers key of the config
+    @staticmethod
+    def parse(text):
+        layers = []
+        for spec in text.split(","):
+            fields = spec.strip().split(":")
+            if len(fields) not in (3, 4) or fields[3:] not in ([], ["stop"]):
+                raise ValueError("bad layer spec %r" % spec)
+            layers.append(
+                _Layer(
+                    int(fields[0]),
+                    Decimal(fields[1]),
+                    Decimal(fields[2]),
+                    fields[3:] == ["stop"],
+                )
+            )
+        return layers
+
+    # the layers and stop_loss_to_limit_layer keys of a config section
+    @classmethod
+    def load(cls, section):
+        return cls(
+            cls.parse(
+                config.get_from_config(
+                    key="layers", section=section, factory=str
+                )
+            ),
+            config.get_from_config(
+                key="stop_loss_to_limit_layer", section=section, factory=int
+            ),
+        )
+
+
 # dynamically move price in layers
 class _DynLayers(_Adjuster):
-    LAYERS = (3, 2, 4, 1, 5)  # in order of preference
-    STOP_LOSS_LAYERS = (5,)
+    USES_QUOTES = False
+    # in order of preference; with LAYER_SECTION set (e.g. "dynlayers"),
+    # the table and the layer stop loss orders move down to are read from
+    # the layers and stop_loss_to_limit_layer keys of that config section
+    # on register() instead
+    LAYER_SECTION = None
+    LAYER_TABLE = (
+        _Layer(3, Decimal("0.10"), as1 * m1, False),
+        _Layer(2, Decimal("0.10"), -as2 * m2, False),
+        _Layer(4, Decimal("0.30"), as1 * mul * m1 - g1, False),
+        _Layer(1, Decimal("0.02"), -as2 * mul * m2, False),
+        _Layer(5, Decimal("0.48"), as1 * mul * m1, True),
+    )
     STOP_LOSS_TO_LIMIT_LAYER = 3
 
-    LAYER_WEIGHTS = {
-        1: Decimal("0.02"),
-        2: Decimal("0.10"),
-        3: Decimal("0.10"),
-        4: Decimal("0.30"),
-        5: Decimal("0.48"),
-    }
-    LAYER_ABS_SKEWS = {
-        1: -as2 * mul * m2,
-        2: -as2 * m2,
-        3: as1 * m1,
-        4: as1 * mul * m1 - g1,
-        5: as1 * mul * m1,
-    }
     # at the moment, we split into just two - unequal - pieces (or one, if the
     # smaller piece is too small / empty after adjustment)
     SPLIT_FACTOR = Decimal(1.2)
@@ -212,16 +978,24 @@ class _DynLayers(_Adjuster):
         if first != amount:
             yield amount - first
 
+    def __init__(self, c):
+        super().__init__(c)
+        self.layers = _LayerPlan(
+            self.LAYER_TABLE, self.STOP_LOSS_TO_LIMIT_LAYER
+        )
+        # asset -> layer -> orders not completed as of the start of the tick;
+        # kept up to date when adjust() moves an order to another layer
+        self._occupancy = {}
+
     def _get_chunk_of(self, o, layer):
-        chunk = o.amount * self.LAYER_WEIGHTS[layer]
+        chunk = o.amount * self.layers.weights[layer]
         chunk_diff = chunk if o.is_buy() else -chunk
-        return abs(self.c.adjust_amount(o.asset, chunk_diff, self.c.ticker()))
+        return abs(
+            self.c.adjust_amount(o.asset, chunk_diff, self.quotes.ticker())
+        )
 
-    @classmethod
-    def _layer_to_order_type(cls, layer):
-        if layer in cls.STOP_LOSS_LAYERS:
-            return order.STOP_LOSS_ORDER
-        return order.LIMIT_ORDER
+    def _layer_to_order_type(self, layer):
+        return self.layers.order_types[layer]
 
     @staticmethod
     def _initialize_layer(o, layer):
@@ -231,7 +1005,7 @@ class _DynLayers(_Adjuster):
     def _split(self, o):
         res = []
         remaining = o.amount
-        for layer in self.LAYERS:
+        for layer in self.layers.order:
             # calculate intended size of the layer chunk of the original order
             amount = self._get_chunk_of(o, layer)
             # cap chunk size by requested amount
@@ -248,12 +1022,13 @@ class _DynLayers(_Adjuster):
                     otype=self._layer_to_order_type(layer),
                 )
                 self._initialize_layer(new_order, layer)
+                self._count("orders_created")
                 res.append(new_order)
                 remaining -= amount
 
         # if all chunks were too small, return the original order
         if not res:
-            self._initialize_layer(o, self.LAYERS[0])
+            self._initialize_layer(o, self.layers.order[0])
             return set([o])
 
         # add the rest to the highest priority order
@@ -263,6 +1038,12 @@ class _DynLayers(_Adjuster):
         return set(res)
 
     def register(self, orders):
+        if self.LAYER_SECTION is None:
+            self.layers = _LayerPlan(
+                self.LAYER_TABLE, self.STOP_LOSS_TO_LIMIT_LAYER
+            )
+        else:
+            self.layers = _LayerPlan.load(self.LAYER_SECTION)
         super().register(orders)
         all_orders = set(self.all_orders)
         self.all_orders = set()
@@ -276,68 +1057,70 @@ class _DynLayers(_Adjuster):
                 key=lambda o: (o.amount, o.layer),
             )
         )
+        self._index_layers()
         return self.all_orders
 
-    @staticmethod
-    def _round_with(price, func):
-        return func(price * Decimal(100)) / Decimal(100)
+    def _start_tick(self, tick, assets=None):
+        super()._start_tick(tick, assets)
+        self._index_layers()
 
-    def _adjust_to_better(self, verb, price):
-        return self._round_with(
-            price, math.floor if verb == "buy" else math.ceil
-        )
+    def _index_layers(self):
+        self._occupancy = {}
+        for o in self.all_orders:
+            if not o.completed:
+                layers = self._occupancy.setdefault(o.asset, {})
+                layers.setdefault(o.layer, set()).add(o)
+
+    def _move_to_layer(self, o, layer):
+        layers = self._occupancy.setdefault(o.asset, {})
+        layers.get(o.layer, set()).discard(o)
+        layers.setdefault(layer, set()).add(o)
+        o.layer = layer
 
     def _adjust_to_layer(self, o, tick):
-        skew = Decimal(1) + self.LAYER_ABS_SKEWS[o.layer]
+        skew = self.layers.skews[o.layer]
         anchor = tick[o.asset]
         if o.is_buy():
             price = anchor * skew
         else:
             price = anchor / skew
-        return self._adjust_to_better(o.verb, price)
+        return self._adjust_to_better(o.asset, o.verb, price)
 
-    def _get_peers(self, o):
-        return {
-            other
-            for other in self.all_orders
-            if other.asset == o.asset and other is not o
-        }
-
-    def _get_pending_peers(self, o):
-        return {other for other in self._get_peers(o) if not other.completed}
+    # pending (not completed) orders of the asset in the layer other than o;
+    # completion is checked again since fills may come in during the tick
+    def _pending_peers_in(self, o, layer):
+        for peer in self._occupancy.get(o.asset, {}).get(layer, ()):
+            if peer is not o and not peer.completed:
+                yield peer
 
     def _peer_posted(self, o):
-        return any(
-            p.posted and p.layer == o.layer for p in self._get_pending_peers(o)
-        )
+        return any(p.posted for p in self._pending_peers_in(o, o.layer))
 
     def _pending_peers_present_in_limit_order_layers(self, o):
-        for peer in self._get_pending_peers(o):
-            if peer.layer not in self.STOP_LOSS_LAYERS:
+        for layer in self.layers.limit_layers:
+            for _ in self._pending_peers_in(o, layer):
                 return True
         return False
 
     def _pending_peers_present_in_higher_layer(self, o):
-        for peer in self._get_pending_peers(o):
-            if peer.layer == o.layer + 1:
-                return True
+        for _ in self._pending_peers_in(o, self.layers.next_layer[o.layer]):
+            return True
         return False
 
-    @classmethod
-    def _is_highest_limit_order_layer(cls, layer):
-        return layer == max(set(cls.LAYERS) - set(cls.STOP_LOSS_LAYERS))
+    def _is_highest_limit_order_layer(self, layer):
+        return layer == self.layers.highest_limit_layer
 
     def _adjust_layer(self, o):
         # move the last standing stop loss orders down
-        if o.layer in self.STOP_LOSS_LAYERS:
+        if o.layer in self.layers.stop_loss_layers:
             if not self._pending_peers_present_in_limit_order_layers(o):
-                o.layer = self.STOP_LOSS_TO_LIMIT_LAYER
+                self._move_to_layer(o, self.layers.stop_loss_to_limit_layer)
                 o._layer_locked = True
         # bubble up limit orders if higher layers are empty
         else:
             if not self._is_highest_limit_order_layer(o.layer):
                 if not self._pending_peers_present_in_higher_layer(o):
-                    o.layer += 1
+                    self._move_to_layer(o, self.layers.next_layer[o.layer])
         # update order type in case layer type changed
         o.desired_type = self._layer_to_order_type(o.layer)
 
@@ -354,98 +1137,43 @@ class _DynLayers(_Adjuster):
 
 class _Delta(_Adjuster):
     DELTA_SECTION = "delta"
-
-    @property
-    def GracePeriod(self):
-        return config.get_from_config(
-            key="GracePeriod", section=self.DELTA_SECTION, factory=int
-        )
-
-    @property
-    def ParN1(self):
-        return config.get_from_config(
-            key="ParN1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def expN1(self):
-        return config.get_from_config(
-            key="expN1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def denN1(self):
-        return config.get_from_config(
-            key="denN1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def ParZ(self):
-        return config.get_from_config(
-            key="ParZ", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def ParP(self):
-        return config.get_from_config(
-            key="ParP", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def expP1(self):
-        return config.get_from_config(
-            key="expP1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def amount_threshold(self):
-        return config.get_from_config(
-            key="amount_threshold", section=self.DELTA_SECTION, factory=float
-        )
-
-    @property
-    def price_threshold(self):
-        return config.get_from_config(
-            key="price_threshold", section=self.DELTA_SECTION, factory=float
-        )
-
-    @property
-    def A1(self):
-        return config.get_from_config(
-            key="A1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def L1(self):
-        return config.get_from_config(
-            key="L1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def L2(self):
-        return config.get_from_config(
-            key="L2", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def delta_bad_cap(self):
-        return config.get_from_config(
-            key="delta_bad_cap", section=self.DELTA_SECTION, factory=float
-        )
-
-    @property
-    def delta_good_cap(self):
-        return config.get_from_config(
-            key="delta_good_cap", section=self.DELTA_SECTION, factory=float
-        )
+    PARAMS = {
+        "GracePeriod": int,
+        "ParN1": Decimal,
+        "expN1": Decimal,
+        "denN1": Decimal,
+        "ParZ": Decimal,
+        "ParP": Decimal,
+        "expP1": Decimal,
+        "amount_threshold": float,
+        "price_threshold": float,
+        "A1": Decimal,
+        "L1": Decimal,
+        "L2": Decimal,
+        "delta_bad_cap": float,
+        "delta_good_cap": float,
+    }
 
     def __init__(self, c):
         super().__init__(c)
         self.pending_orders = []
+        self.params = None
+        # parameter values taking precedence over the config file, e.g. for
+        # parameter sweeps
+        self.param_overrides = {}
 
     def register(self, orders):
         super().register(orders)
         self.pending_orders = []
+        self.reload_params()
+
+    def reload_params(self):
+        self.params = _Params(
+            self.DELTA_SECTION,
+            self.PARAMS,
+            self.CONFIG_PATH,
+            self.param_overrides,
+        )
 
     def _get_any_original_order(self):
         for o in self.all_orders:
@@ -453,7 +1181,13 @@ class _Delta(_Adjuster):
 
     @property
     def time_is_up(self):
-        return self.remaining_time < self.GracePeriod
+        return self.remaining_time < self.params.GracePeriod
+
+    def _time_bucket(self):
+        return (
+            int(self.remaining_time // self.INCREMENTAL_TIME_BUCKET),
+            self.time_is_up,
+        )
 
     @property
     def remaining_time(self):
@@ -465,96 +1199,69 @@ class _Delta(_Adjuster):
         time_passed = o.time_cb() - o._start_time
         return Decimal(self.c.trading_interval - time_passed.total_seconds())
 
-    @staticmethod
-    def _round_with(price, func):
-        return func(price * Decimal(100)) / Decimal(100)
-
-    def _adjust_to_better(self, verb, price):
-        return self._round_with(
-            price, math.ceil if verb == "sell" else math.floor
-        )
-
-    def _adjust_to_worse(self, verb, price):
-        return self._round_with(
-            price, math.floor if verb == "sell" else math.ceil
-        )
-
     def adjust(self, o, tick):
         if o._to_cancel:
             return
         price = self.c.adjust_price(o.asset, tick[o.asset])
         if o.type == order.LIMIT_ORDER:
-            if self.c.is_wild_price_move(o.asset, o.is_buy()):
+            if self._is_wild_price_move(o.asset, o.is_buy()):
                 o.add_flag("wild")
                 if o.is_buy():
                     price = self.c.adjust_price(
-                        o.asset, self.c.get_ask(o.asset)
+                        o.asset, self.quotes.get_ask(o.asset)
                     )
                 else:
                     price = self.c.adjust_price(
-                        o.asset, self.c.get_bid(o.asset)
+                        o.asset, self.quotes.get_bid(o.asset)
                     )
-                o.desired_price = self._adjust_to_worse(o.verb, price)
+                o.desired_price = self._adjust_to_worse(o.asset, o.verb, price)
             else:
                 o.remove_flag("wild")
                 if self.time_is_up:
-                    o.desired_price = self._adjust_to_worse(o.verb, price)
+                    o.desired_price = self._adjust_to_worse(
+                        o.asset, o.verb, price
+                    )
                 else:
-                    o.desired_price = self._adjust_to_better(o.verb, price)
+                    o.desired_price = self._adjust_to_better(
+                        o.asset, o.verb, price
+                    )
         else:
-            o.desired_price = self._adjust_to_worse(o.verb, price)
+            o.desired_price = self._adjust_to_worse(o.asset, o.verb, price)
 
     def _get_limit_order(self, asset):
-        for o in self.pending_orders:
-            if o.asset == asset and not o._stop_loss and not o._accounted_for:
+        for o in self._get_live_orders(asset):
+            if not o._stop_loss:
                 return o
 
     def _get_stop_limit_order(self, asset):
-        for o in self.pending_orders:
-            if o.asset == asset and o._stop_loss and not o._accounted_for:
-                return o
-
-    def _get_original_order(self, asset):
-        for o in self.all_orders:
-            if o.asset == asset:
+        for o in self._get_live_orders(asset):
+            if o._stop_loss:
                 return o
 
-    def _get_delta(self, asset, tick):
-        orig_order = self._get_original_order(asset)
-        delta = (
-            (tick[asset] - orig_order.target_price)
-            / orig_order.target_price
-            * Decimal(100)
-        )
-        if orig_order.verb == "sell":
-            return -delta
-        return delta
-
     def _to_trade(self, asset, tick):
+        p = self.params
         orig_order = self._get_original_order(asset)
         delta = self._get_delta(asset, tick)
         min_amount = Decimal(1)
-        v_t = self.A1 * (
-            (orig_order.remaining / orig_order.amount) ** self.L1
+        v_t = p.A1 * (
+            (orig_order.remaining / orig_order.amount) ** p.L1
             # make sure we don't ever divide by zero
-            / (max(Decimal(1), self.remaining_time) / 2) ** self.L2
+            / (max(Decimal(1), self.remaining_time) / 2) ** p.L2
         )
-        if delta > self.delta_bad_cap:
+        if delta > p.delta_bad_cap:
             S1 = S2 = Decimal(0)
             min_amount = Decimal(0)
-        elif delta < self.delta_good_cap or self.time_is_up:
+        elif delta < p.delta_good_cap or self.time_is_up:
             S1 = Decimal(1)
             S2 = Decimal(0)
         elif delta < 0:
-            S1 = max(v_t, self.ParN1 * abs(delta) ** self.expN1 / self.denN1)
+            S1 = max(v_t, p.ParN1 * abs(delta) ** p.expN1 / p.denN1)
             S2 = Decimal(0)
         elif delta == 0:
-            S1 = max(v_t, self.ParZ)
+            S1 = max(v_t, p.ParZ)
             S2 = Decimal(0)
         else:
-            S1 = S2 = max(
-                v_t, self.ParP * abs(delta) ** self.expP1 / self.denN1
-            )
+            S1 = S2 = max(v_t, p.ParP * abs(delta) ** p.expP1 / p.denN1)
 
         S1 = min(
             orig_order.remaining,
@@ -562,7 +1269,7 @@ class _Delta(_Adjuster):
                 min_amount,
                 abs(
                     self.c.adjust_amount(
-                        asset, S1 * orig_order.amount, self.c.ticker()
+                        asset, S1 * orig_order.amount, self.quotes.ticker()
                     )
                 ),
             ),
@@ -574,7 +1281,7 @@ class _Delta(_Adjuster):
                     min_amount,
                     abs(
                         self.c.adjust_amount(
-                            asset, S2 * orig_order.amount, self.c.ticker()
+                            asset, S2 * orig_order.amount, self.quotes.ticker()
                         )
                     ),
                 ),
@@ -584,7 +1291,7 @@ class _Delta(_Adjuster):
                 orig_order.remaining - S1,
                 abs(
                     self.c.adjust_amount(
-                        asset, S2 * orig_order.amount, self.c.ticker()
+                        asset, S2 * orig_order.amount, self.quotes.ticker()
                     )
                 ),
             )
@@ -594,28 +1301,19 @@ class _Delta(_Adjuster):
 
         return S1, S2, rem
 
-    def _account_for_completed_orders(self):
-        def register_filled(asset, filled):
-            orig_order = self._get_original_order(asset)
-            orig_order.filled += filled
-
-        for o in set(self.pending_orders):
-            if not o._accounted_for:
-                if o.completed:
-                    register_filled(o.asset, o.filled)
-                    o._accounted_for = True
-                elif o._to_cancel and not o.posted:
-                    register_filled(o.asset, o.filled)
-                    self.pending_orders.remove(o)
-
-    def get_orders(self, tick):
+    def get_orders(self, tick, assets=None):
+        # no parameters before register(), and no orders to size either
+        if self.params is not None:
+            self.params.reload_if_changed()
+        self._start_tick(tick, assets)
         self._account_for_completed_orders()
+        if self.INCREMENTAL and assets is None:
+            assets = self._dirty_assets(tick)
 
         for o in self.all_orders:
-            self.c.log(
-                "%s executed at: %.2f (%d/%d)"
-                % (o.asset, o.filled / o.amount * 100, o.filled, o.amount)
-            )
+            if assets is not None and o.asset not in assets:
+                continue
+            self._log_progress(o)
 
             limit_to_trade, stop_loss_to_trade, rem = self._to_trade(
                 o.asset, tick
@@ -629,19 +1327,16 @@ class _Delta(_Adjuster):
             if limit_to_trade == 0:
                 # nothing to trade; cancel existing order if any
                 if lo is not None:
-                    lo.desired_price = None
-                    lo._to_cancel = True
+                    self._cancel(lo)
                     rem -= lo.amount
             else:
                 # prepare the new order candidate
-                new_order = orig_order.__class__(
-                    o.asset,
+                new_order = _Intent(
+                    orig_order,
                     limit_to_trade,
-                    orig_order.target_price,
-                    time_cb=orig_order.time_cb,
                     otype=order.LIMIT_ORDER,
+                    stop_loss=False,
                 )
-                new_order._stop_loss = False
 
                 # make sure the price we use to determine if we need to cancel
                 # an existing order is already adjusted to avoid unnecessary
@@ -650,11 +1345,12 @@ class _Delta(_Adjuster):
 
                 if lo is None:
                     # post new order only if the old one is gone
-                    self.pending_orders.append(new_order)
+                    self._add_pending_order(new_order)
                 else:
                     # if the amount or price is different, cancel the order
                     # this iteration; the next iteration we'll revisit the spot
-                    # price and perhaps post the new order
+                    # price and perhaps post the new order (unless the order
+                    # is replaced right away, see REPLACE_ORDERS)
                     if (
                         lo.amount != limit_to_trade
                         or lo.actual_price != new_order.desired_price
@@ -672,33 +1368,30 @@ class _Delta(_Adjuster):
                             price_change = 1.0
                         negligent_change = (
                             lo.actual_price == new_order.desired_price
-                            and amount_change < self.amount_threshold
+                            and amount_change < self.params.amount_threshold
                         ) or (
                             lo.amount == new_order.amount
-                            and price_change < self.price_threshold
+                            and price_change < self.params.price_threshold
                         )
-                        if not negligent_change:
-                            lo.desired_price = None
-                            lo._to_cancel = True
-                            rem -= lo.amount
+                        if negligent_change:
+                            self._count("negligent_changes")
+                        else:
+                            rem -= self._change_order(lo, new_order)
 
             slo = self._get_stop_limit_order(o.asset)
             if stop_loss_to_trade == 0:
                 # nothing to trade; cancel existing order if any
                 if slo is not None:
-                    slo.desired_price = None
-                    slo._to_cancel = True
+                    self._cancel(slo)
                     rem -= slo.amount
             else:
                 # prepare the new order candidate
-                new_order = orig_order.__class__(
-                    o.asset,
+                new_order = _Intent(
+                    orig_order,
                     stop_loss_to_trade,
-                    orig_order.target_price,
-                    time_cb=orig_order.time_cb,
                     otype=order.STOP_LOSS_ORDER,
+                    stop_loss=True,
                 )
-                new_order._stop_loss = True
 
                 # make sure the price we use to determine if we need to cancel
                 # an existing order is already adjusted to avoid unnecessary
@@ -707,11 +1400,12 @@ class _Delta(_Adjuster):
 
                 if slo is None:
                     # post new order only if the old one is gone
-                    self.pending_orders.append(new_order)
+                    self._add_pending_order(new_order)
                 else:
                     # if the amount or price is different, cancel the order
                     # this iteration; the next iteration we'll revisit the spot
-                    # price and perhaps post the new order
+                    # price and perhaps post the new order (unless the order
+                    # is replaced right away, see REPLACE_ORDERS)
                     if (
                         slo.amount != stop_loss_to_trade
                         or slo.actual_price != new_order.desired_price
@@ -730,118 +1424,81 @@ class _Delta(_Adjuster):
                             price_change = 1.0
                         negligent_change = (
                             slo.actual_price == new_order.desired_price
-                            and amount_change < self.amount_threshold
+                            and amount_change < self.params.amount_threshold
                         ) or (
                             slo.amount == new_order.amount
-                            and price_change < self.price_threshold
+                            and price_change < self.params.price_threshold
                         )
-                        if not negligent_change:
-                            slo.desired_price = None
-                            slo._to_cancel = True
-                            rem -= slo.amount
+                        if negligent_change:
+                            self._count("negligent_changes")
+                        else:
+                            rem -= self._change_order(slo, new_order)
 
-            rem_order = orig_order.__class__(
-                o.asset,
-                rem,
-                orig_order.target_price,
-                time_cb=orig_order.time_cb,
-            )
-            rem_order.desired_price = None
+            rem_order = _Intent(orig_order, rem)
             rem_order._to_cancel = True
-            self.pending_orders.append(rem_order)
+            self._add_pending_order(rem_order)
 
+        if self.INCREMENTAL:
+            self._remember_evaluated(assets, tick)
         return {o for o in self.pending_orders if o.amount > 0}
 
 
 class _NewDelta(_Adjuster):
     DELTA_SECTION = "newdelta"
-
-    @property
-    def ParN1(self):
-        return config.get_from_config(
-            key="ParN1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def expN1(self):
-        return config.get_from_config(
-            key="expN1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def ParZ(self):
-        return config.get_from_config(
-            key="ParZ", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def ParP1(self):
-        return config.get_from_config(
-            key="ParP1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def expP1(self):
-        return config.get_from_config(
-            key="expP1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def amount_threshold(self):
-        return config.get_from_config(
-            key="amount_threshold", section=self.DELTA_SECTION, factory=float
-        )
-
-    @property
-    def price_threshold(self):
-        return config.get_from_config(
-            key="price_threshold", section=self.DELTA_SECTION, factory=float
-        )
-
-    @property
-    def A1(self):
-        return config.get_from_config(
-            key="A1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def A2(self):
-        return config.get_from_config(
-            key="A2", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def A3(self):
-        return config.get_from_config(
-            key="A3", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def L1(self):
-        return config.get_from_config(
-            key="L1", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def L2(self):
-        return config.get_from_config(
-            key="L2", section=self.DELTA_SECTION, factory=Decimal
-        )
-
-    @property
-    def delta_bad_cap(self):
-        return config.get_from_config(
-            key="delta_bad_cap", section=self.DELTA_SECTION, factory=float
-        )
+    # size baskets of at least this many assets with the vectorized sizing
+    # curve (needs numpy); None always uses the Decimal reference path
+    BATCH_SIZING_MIN_ASSETS = None
+    # count1 (the escalation of the sizing curve) goes up by one for every
+    # get_orders() call an asset doesn't fill in; with ESCALATION_PERIOD
+    # (seconds) set it goes up by one per period instead, as measured by the
+    # orders' clock, so that it doesn't depend on how often the engine calls
+    # (see events.py)
+    ESCALATION_PERIOD = None
+    CHECKPOINT_ATTRS = _Adjuster.CHECKPOINT_ATTRS + (
+        "count1",
+        "_escalated_at",
+    )
+    PARAMS = {
+        "ParN1": Decimal,
+        "expN1": Decimal,
+        "ParZ": Decimal,
+        "ParP1": Decimal,
+        "expP1": Decimal,
+        "amount_threshold": float,
+        "price_threshold": float,
+        "A1": Decimal,
+        "A2": Decimal,
+        "A3": Decimal,
+        "L1": Decimal,
+        "L2": Decimal,
+        "delta_bad_cap": float,
+    }
 
     def __init__(self, c):
         super().__init__(c)
         self.pending_orders = []
+        self.params = None
+        # parameter values taking precedence over the config file, e.g. for
+        # parameter sweeps
+        self.param_overrides = {}
+        self.count1 = {}
+        self._escalated_at = None
 
     def register(self, orders):
         super().register(orders)
         self.pending_orders = []
         self.count1 = {o.asset: 1 for o in orders}
+        # set by the first _escalation_step()
+        self._escalated_at = None
+        self.reload_params()
+
+    def reload_params(self):
+        self.params = _Params(
+            self.DELTA_SECTION,
+            self.PARAMS,
+            self.CONFIG_PATH,
+            self.param_overrides,
+        )
 
     def _get_any_original_order(self):
         for o in self.all_orders:
@@ -857,83 +1514,75 @@ class _NewDelta(_Adjuster):
         time_passed = o.time_cb() - o._start_time
         return Decimal(self.c.trading_interval - time_passed.total_seconds())
 
-    @staticmethod
-    def _round_with(price, func):
-        return func(price * Decimal(100)) / Decimal(100)
-
-    def _adjust_to_better(self, verb, price):
-        return self._round_with(
-            price, math.ceil if verb == "sell" else math.floor
-        )
+    def _time_bucket(self):
+        return int(self.remaining_time // self.INCREMENTAL_TIME_BUCKET)
 
     def adjust(self, o, tick):
         if o._to_cancel:
             return
         price = self.c.adjust_price(o.asset, tick[o.asset])
-        o.desired_price = self._adjust_to_better(o.verb, price)
+        o.desired_price = self._adjust_to_better(o.asset, o.verb, price)
 
         delta = self._get_delta(o.asset, tick)
         if delta > 0:
+            # one tick further away
+            tick_size = self._tick_grid(o.asset, price).size
             if o.is_buy():
-                # todo: don't hardcode one penny
-                o.desired_price = o.desired_price - Decimal("0.01")
+                o.desired_price = o.desired_price - tick_size
             else:
-                o.desired_price = o.desired_price + Decimal("0.01")
+                o.desired_price = o.desired_price + tick_size
 
         if o.is_buy():
-            ask_price = self.c.get_ask(o.asset)
+            ask_price = self.quotes.get_ask(o.asset)
             d1 = (ask_price - price) / price * 100
             if d1 < 0.005:
                 price = self.c.adjust_price(o.asset, ask_price)
-                o.desired_price = self._adjust_to_better(o.verb, price)
+                o.desired_price = self._adjust_to_better(
+                    o.asset, o.verb, price
+                )
         else:
-            bid_price = self.c.get_bid(o.asset)
+            bid_price = self.quotes.get_bid(o.asset)
             d1 = (price - bid_price) / price * 100
             if d1 < 0.005:
                 price = self.c.adjust_price(o.asset, bid_price)
-                o.desired_price = self._adjust_to_better(o.verb, price)
+                o.desired_price = self._adjust_to_better(
+                    o.asset, o.verb, price
+                )
 
     def _get_limit_order(self, asset):
-        for o in self.pending_orders:
-            if o.asset == asset and not o._accounted_for:
-                return o
-
-    def _get_original_order(self, asset):
-        for o in self.all_orders:
-            if o.asset == asset:
-                return o
-
-    def _get_delta(self, asset, tick):
-        orig_order = self._get_original_order(asset)
-        delta = (
-            (tick[asset] - orig_order.target_price)
-            / orig_order.target_price
-            * Decimal(100)
-        )
-        if orig_order.verb == "sell":
-            return -delta
-        return delta
+        for o in self._get_live_orders(asset):
+            return o
 
-    def _to_trade(self, asset, tick):
+    # share of the original order to trade this tick; this is the reference
+    # implementation of the sizing curve, sizing.new_delta_s1() is the
+    # vectorized equivalent for whole baskets
+    def _get_s1(self, asset, tick):
+        p = self.params
         orig_order = self._get_original_order(asset)
         delta = self._get_delta(asset, tick)
-        min_amount = Decimal(1)
         v_t = (
-            self.A1
-            * (orig_order.remaining / orig_order.amount) ** self.L1
+            p.A1
+            * (orig_order.remaining / orig_order.amount) ** p.L1
             # make sure we don't ever divide by zero
-            / (self.A2 * (max(Decimal(1), self.remaining_time) / 2) ** self.L2)
-            * self.A3
+            / (p.A2 * (max(Decimal(1), self.remaining_time) / 2) ** p.L2)
+            * p.A3
             * self.count1[asset]
         ) / orig_order.amount
         if delta < 0:
-            S1 = max(v_t, self.ParN1 * abs(delta) ** self.expN1)
+            S1 = max(v_t, p.ParN1 * abs(delta) ** p.expN1)
         elif delta == 0:
-            S1 = self.ParZ
+            S1 = p.ParZ
         elif delta > 0:
-            S1 = max(v_t, self.ParP1 * abs(delta) ** self.expP1)
-            if delta > self.delta_bad_cap:
+            S1 = max(v_t, p.ParP1 * abs(delta) ** p.expP1)
+            if delta > p.delta_bad_cap:
                 S1 = Decimal(0)
+        return S1
+
+    def _to_trade(self, asset, tick, S1=None):
+        orig_order = self._get_original_order(asset)
+        min_amount = Decimal(1)
+        if S1 is None:
+            S1 = self._get_s1(asset, tick)
 
         if S1 > 0:
             S1 = min(
@@ -942,45 +1591,68 @@ class _NewDelta(_Adjuster):
                     min_amount,
                     abs(
                         self.c.adjust_amount(
-                            asset, S1 * orig_order.amount, self.c.ticker()
+                            asset, S1 * orig_order.amount, self.quotes.ticker()
                         )
                     ),
                 ),
             )
         return S1, orig_order.remaining - S1
 
-    def _account_for_completed_orders(self):
-        filled_assets = set()
-
-        def register_filled(asset, filled):
-            orig_order = self._get_original_order(asset)
-            orig_order.filled += filled
-            if filled > 0:
-                filled_assets.add(asset)
-
-        for o in set(self.pending_orders):
-            if not o._accounted_for:
-                if o.completed:
-                    register_filled(o.asset, o.filled)
-                    o._accounted_for = True
-                elif o._to_cancel and not o.posted:
-                    register_filled(o.asset, o.filled)
-                    self.pending_orders.remove(o)
+    def _escalation_step(self):
+        if self.ESCALATION_PERIOD is None:
+            return 1
+        o = self._get_any_original_order()
+        if o is None:
+            return 0
+        now = o.time_cb()
+        if self._escalated_at is None:
+            # the first call escalates by a full period, like the first call
+            # without ESCALATION_PERIOD does
+            self._escalated_at = o._start_time - datetime.timedelta(
+                seconds=self.ESCALATION_PERIOD
+            )
+        elapsed = (now - self._escalated_at).total_seconds()
+        self._escalated_at = now
+        return Decimal(repr(elapsed)) / Decimal(self.ESCALATION_PERIOD)
 
+    def _account_for_completed_orders(self):
+        filled_assets = super()._account_for_completed_orders()
+        step = self._escalation_step()
         for k in self.count1:
             if k not in filled_assets:
-                self.count1[k] += 1
-
-    def get_orders(self, tick):
+                self.count1[k] += step
+
+    def _get_batch_s1(self, tick, assets=None):
+        if self.BATCH_SIZING_MIN_ASSETS is None or (
+            len(self.all_orders if assets is None else assets)
+            < self.BATCH_SIZING_MIN_ASSETS
+        ):
+            return {}
+        import sizing
+
+        if assets is not None:
+            assets = [a for a in self._original_orders if a in assets]
+        assets, S1 = sizing.new_delta_s1_for(self, tick, assets)
+        return {a: Decimal(float(s)) for a, s in zip(assets, S1)}
+
+    def get_orders(self, tick, assets=None):
+        # no parameters before register(), and no orders to size either
+        if self.params is not None:
+            self.params.reload_if_changed()
+        self._start_tick(tick, assets)
         self._account_for_completed_orders()
+        if self.INCREMENTAL and assets is None:
+            assets = self._dirty_assets(tick)
+        batch_s1 = self._get_batch_s1(tick, assets)
 
         for o in self.all_orders:
-            self.c.log(
-                "%s executed at: %.2f (%d/%d)"
-                % (o.asset, o.filled / o.amount * 100, o.filled, o.amount)
-            )
+            if assets is not None and o.asset not in assets:
+                continue
+            self._log_progress(o)
 
-            limit_to_trade, rem = self._to_trade(o.asset, tick)
+            limit_to_trade, rem = self._to_trade(
+                o.asset, tick, batch_s1.get(o.asset)
+            )
 
             # original order is used for accounting purposes to carry
             # information about remaining assets to trade
@@ -990,17 +1662,12 @@ class _NewDelta(_Adjuster):
             if limit_to_trade == 0:
                 # nothing to trade; cancel existing order if any
                 if lo is not None:
-                    lo.desired_price = None
-                    lo._to_cancel = True
+                    self._cancel(lo)
                     rem -= lo.amount
             else:
                 # prepare the new order candidate
-                new_order = orig_order.__class__(
-                    o.asset,
-                    limit_to_trade,
-                    orig_order.target_price,
-                    time_cb=orig_order.time_cb,
-                    otype=order.LIMIT_ORDER,
+                new_order = _Intent(
+                    orig_order, limit_to_trade, otype=order.LIMIT_ORDER
                 )
 
                 # make sure the price we use to determine if we need to cancel
@@ -1010,11 +1677,12 @@ class _NewDelta(_Adjuster):
 
                 if lo is None:
                     # post new order only if the old one is gone
-                    self.pending_orders.append(new_order)
+                    self._add_pending_order(new_order)
                 else:
                     # if the amount or price is different, cancel the order
                     # this iteration; the next iteration we'll revisit the spot
-                    # price and perhaps post the new order
+                    # price and perhaps post the new order (unless the order
+                    # is replaced right away, see REPLACE_ORDERS)
                     if (
                         lo.amount != limit_to_trade
                         or lo.actual_price != new_order.desired_price
@@ -1032,26 +1700,22 @@ class _NewDelta(_Adjuster):
                             price_change = 1.0
                         negligent_change = (
                             lo.actual_price == new_order.desired_price
-                            and amount_change < self.amount_threshold
+                            and amount_change < self.params.amount_threshold
                         ) or (
                             lo.amount == new_order.amount
-                            and price_change < self.price_threshold
+                            and price_change < self.params.price_threshold
                         )
-                        if not negligent_change:
-                            lo.desired_price = None
-                            lo._to_cancel = True
-                            rem -= lo.amount
+                        if negligent_change:
+                            self._count("negligent_changes")
+                        else:
+                            rem -= self._change_order(lo, new_order)
 
-            rem_order = orig_order.__class__(
-                o.asset,
-                rem,
-                orig_order.target_price,
-                time_cb=orig_order.time_cb,
-            )
-            rem_order.desired_price = None
+            rem_order = _Intent(orig_order, rem)
             rem_order._to_cancel = True
-            self.pending_orders.append(rem_order)
+            self._add_pending_order(rem_order)
 
+        if self.INCREMENTAL:
+            self._remember_evaluated(assets, tick)
         return {o for o in self.pending_orders if o.amount > 0}
 
 
@@ -0,0 +1,146 @@
+import csv
+import gzip
+import os
+import queue
+import threading
+import time
+
+# records the ticks an adjuster sees into gzipped tapes in the layout of
+# last_with_2s.csv (one column per symbol, one row per tick), so that
+# replay.py, sweep.py and tape.load() read them as they are:
+#
+#   adjuster.recorder = TapeRecorder("tapes")
+#   ...
+#   adjuster.recorder.close()
+#
+# every file comes with siblings of the same shape holding the bid and ask
+# quotes the adjuster fetched during the tick and a single column file
+# with the time of each row:
+#
+#   ticks-20240102-093000-0000.csv.gz
+#   ticks-20240102-093000-0000.bid.csv.gz
+#   ticks-20240102-093000-0000.ask.csv.gz
+#   ticks-20240102-093000-0000.time.csv.gz
+#
+# files are rotated after rotate_rows rows and whenever a symbol shows up
+# that isn't a column of the current file. Writing happens on a background
+# thread; record() only queues the tick and drops it (counted in dropped)
+# when max_queue ticks are waiting. A tick is queued when the next one is
+# recorded, once the adjuster is done fetching quotes for it.
+
+SUFFIXES = ("", ".bid", ".ask")
+TIME_SUFFIX = ".time"
+
+
+def _format(price):
+    return "" if price is None else str(price)
+
+
+class TapeRecorder:
+    def __init__(
+        self,
+        directory,
+        prefix="ticks",
+        rotate_rows=11700,
+        max_queue=1000,
+        compresslevel=6,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_rows = rotate_rows
+        self.compresslevel = compresslevel
+        self.dropped = 0
+        self.paths = []
+        self._queue = queue.Queue(max_queue)
+        self._held = None
+        self._files = None
+        self._writers = None
+        self._symbols = None
+        self._rows = 0
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, tick, quotes=None):
+        held, self._held = self._held, (time.time(), dict(tick), quotes)
+        if held is None:
+            return
+        try:
+            self._queue.put_nowait(held)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._held is not None:
+            self._queue.put(self._held)
+            self._held = None
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(*item)
+        self._close_files()
+
+    def _write(self, timestamp, tick, quotes):
+        bid_ask = quotes.bid_ask() if quotes is not None else {}
+        if (
+            self._files is None
+            or self._rows >= self.rotate_rows
+            or not self._symbols.issuperset(tick)
+        ):
+            self._open(sorted(tick))
+        symbols = self._header
+        prices, bids, asks = self._writers
+        prices.writerow([_format(tick.get(s)) for s in symbols])
+        bids.writerow(
+            [_format(bid_ask.get(s, (None, None))[0]) for s in symbols]
+        )
+        asks.writerow(
+            [_format(bid_ask.get(s, (None, None))[1]) for s in symbols]
+        )
+        self._times.writerow([repr(timestamp)])
+        self._rows += 1
+
+    def _open(self, symbols):
+        self._close_files()
+        base = os.path.join(
+            self.directory,
+            "%s-%s-%04d"
+            % (self.prefix, time.strftime("%Y%m%d-%H%M%S"), self._sequence),
+        )
+        self._sequence += 1
+        self._files = []
+        self._writers = []
+        for suffix in SUFFIXES:
+            path = base + suffix + ".csv.gz"
+            f = gzip.open(
+                path, "wt", newline="", compresslevel=self.compresslevel
+            )
+            writer = csv.writer(f)
+            writer.writerow(symbols)
+            self._files.append(f)
+            self._writers.append(writer)
+            if not suffix:
+                self.paths.append(path)
+        f = gzip.open(
+            base + TIME_SUFFIX + ".csv.gz",
+            "wt",
+            newline="",
+            compresslevel=self.compresslevel,
+        )
+        self._times = csv.writer(f)
+        self._times.writerow(["time"])
+        self._files.append(f)
+        self._header = symbols
+        self._symbols = frozenset(symbols)
+        self._rows = 0
+
+    def _close_files(self):
+        for f in self._files or ():
+            f.close()
+        self._files = None
@@ -0,0 +1,400 @@
+import argparse
+import collections
+import concurrent.futures
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import math
+import zlib
+
+from blade import order
+
+import coalesce
+import fills
+import priceadjust
+import tape
+
+TICK_PERIOD = 2  # seconds between two snapshots of the tape
+DEFAULT_RULES = ("delta", "newdelta", "askbid", "dynlayers")
+PENNY = Decimal("0.01")
+
+# params are (key, value) pairs overriding the rule's config parameters;
+# replace turns on the rule's REPLACE_ORDERS; fills names the fill model
+# (see fills.MODELS)
+Segment = collections.namedtuple(
+    "Segment",
+    "rule verb asset start stop tape notional spread params replace fills",
+    defaults=((), False, "touch"),
+)
+SegmentResult = collections.namedtuple(
+    "SegmentResult",
+    "rule verb asset start target_price amount filled notional cancels "
+    "replaces",
+    defaults=(0,),
+)
+
+
+def make_segments(
+    path,
+    rules,
+    verb="buy",
+    window=150,
+    notional=10000,
+    spread=1,
+    replace=False,
+    fills="touch",
+):
+    # split the tape in consecutive windows of a single trading interval per
+    # symbol, the same way Stock1RealDriftProduction1.m does
+    t = tape.load_shared(path)
+    segments = []
+    for asset in t.symbols:
+        column = t.column(asset)
+        for start in range(0, len(t) - window + 1, window):
+            # the first snapshot of a window sets the target price
+            if column[start] != column[start]:
+                continue
+            for rule in rules:
+                segments.append(
+                    Segment(
+                        rule,
+                        verb,
+                        asset,
+                        start,
+                        start + window,
+                        path,
+                        notional,
+                        spread,
+                        replace=replace,
+                        fills=fills,
+                    )
+                )
+    return segments
+
+
+class _Clock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class SimOrder:
+    verb = None
+
+    def __init__(
+        self, asset, amount, target_price, time_cb, otype=order.LIMIT_ORDER
+    ):
+        self.asset = asset
+        self.amount = amount
+        self.target_price = target_price
+        self.time_cb = time_cb
+        self._start_time = time_cb()
+        self.type = otype
+        self.desired_type = otype
+        self.desired_price = None
+        self.actual_price = None
+        self.filled = Decimal(0)
+        self.posted = False
+        self.completed = False
+        self.flags = set()
+        self._to_cancel = False
+        self._accounted_for = False
+        self._stop_loss = False
+
+    @property
+    def remaining(self):
+        return self.amount - self.filled
+
+    def is_buy(self):
+        return self.verb == "buy"
+
+    def is_sell(self):
+        return self.verb == "sell"
+
+    def add_flag(self, flag):
+        self.flags.add(flag)
+
+    def remove_flag(self, flag):
+        self.flags.discard(flag)
+
+
+class SimBuyOrder(SimOrder):
+    verb = "buy"
+
+
+class SimSellOrder(SimOrder):
+    verb = "sell"
+
+
+ORDER_CLASSES = {"buy": SimBuyOrder, "sell": SimSellOrder}
+
+
+# stand-in for the engine context the adjusters get as `c`; quotes are
+# derived from the last price with a fixed spread (in pennies)
+class SimContext:
+    def __init__(self, trading_interval, spread=1):
+        self.trading_interval = trading_interval
+        self.half_spread = PENNY * spread / 2
+        self.tick = {}
+
+    def log(self, msg):
+        pass
+
+    def ticker(self):
+        return self.tick
+
+    def get_bid(self, asset):
+        return self.tick[asset] - self.half_spread
+
+    def get_ask(self, asset):
+        return self.tick[asset] + self.half_spread
+
+    def get_quotes(self, assets):
+        return {
+            a: (self.get_bid(a), self.get_ask(a))
+            for a in assets
+            if a in self.tick
+        }
+
+    def adjust_price(self, asset, price):
+        return Decimal(price).quantize(PENNY, rounding=ROUND_HALF_UP)
+
+    def adjust_amount(self, asset, amount, ticker):
+        # whole shares only, rounded towards zero
+        return Decimal(int(amount))
+
+    def is_wild_price_move(self, asset, is_buy):
+        return False
+
+
+# deterministic broker: posted orders fill as the fill model says (by
+# default completely at their price as soon as the last price touches it,
+# see fills.py); replaces (including repricing an order) are atomic and
+# counted separately from cancels
+class SimBroker:
+    def __init__(self, model=None):
+        self.model = model if model is not None else fills.TouchFill()
+        # live orders, in the order they went live
+        self.live = {}
+        self.cancels = 0
+        self.replaces = 0
+        self.filled = collections.Counter()
+        self.notional = collections.Counter()
+
+    def _fill(self, o, amount, price):
+        o.filled += amount
+        self.filled[o.asset] += amount
+        self.notional[o.asset] += amount * price
+        if o.filled >= o.amount:
+            o.completed = True
+            o.posted = False
+            del self.live[o]
+            self.model.removed(o)
+
+    def match(self, tick):
+        for o in list(self.live):
+            result = self.model.fill(o, tick[o.asset])
+            if result is not None:
+                self._fill(o, *result)
+
+    def _remove(self, o):
+        o.posted = False
+        if self.live.pop(o, False) is not False:
+            self.model.removed(o)
+
+    def _cancel(self, o):
+        self._remove(o)
+        self.cancels += 1
+
+    def _post(self, o):
+        o.posted = True
+        o.actual_price = o.desired_price
+        o.type = o.desired_type
+        self.live[o] = None
+        self.model.posted(o)
+
+    def _replace(self, old, new):
+        self._remove(old)
+        self._post(new)
+        self.replaces += 1
+
+    def sync(self, orders):
+        for o in coalesce.stale_successors(orders):
+            coalesce.abandon(o)
+        for action in coalesce.diff(orders):
+            if action.kind == coalesce.CANCEL:
+                self._cancel(action.order)
+            elif action.kind == coalesce.POST:
+                self._post(action.order)
+            else:
+                self._replace(action.replaces, action.order)
+
+
+def run_segment(segment):
+    column = tape.load_shared(segment.tape).column(segment.asset)
+    prices = [
+        Decimal(repr(p)) if p == p else None
+        for p in column[segment.start : segment.stop].tolist()
+    ]
+    trading_interval = len(prices) * TICK_PERIOD
+    c = SimContext(trading_interval, segment.spread)
+    clock = _Clock(datetime.datetime(2000, 1, 1))
+    target_price = prices[0]
+    amount = Decimal(math.floor(segment.notional / target_price))
+    orig_order = ORDER_CLASSES[segment.verb](
+        segment.asset, amount, target_price, time_cb=clock
+    )
+
+    adjuster = priceadjust.get_rules(segment.rule)(c)
+    if segment.params:
+        adjuster.param_overrides = dict(segment.params)
+    if segment.replace:
+        adjuster.REPLACE_ORDERS = True
+    adjuster.register([orig_order])
+    reprice = priceadjust.needs_adjust(adjuster)
+    # every rule sees the same fills for a window of a symbol
+    seed = zlib.crc32(("%s:%d" % (segment.asset, segment.start)).encode())
+    broker = SimBroker(fills.get_model(segment.fills, seed))
+    for price in prices:
+        if price is None:
+            # no quote in this snapshot
+            clock.now += datetime.timedelta(seconds=TICK_PERIOD)
+            continue
+        tick = {segment.asset: price}
+        c.tick = tick
+        broker.match(tick)
+        orders = adjuster.get_orders(tick)
+        if reprice:
+            for o in orders:
+                adjuster.adjust(o, tick)
+        broker.sync(orders)
+        clock.now += datetime.timedelta(seconds=TICK_PERIOD)
+
+    return SegmentResult(
+        segment.rule,
+        segment.verb,
+        segment.asset,
+        segment.start,
+        target_price,
+        amount,
+        broker.filled[segment.asset],
+        broker.notional[segment.asset],
+        broker.cancels,
+        broker.replaces,
+    )
+
+
+def replay(segments, processes=None):
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(run_segment, segments, chunksize=64))
+
+
+# per rule: volume weighted slippage vs. target price in basis points
+# (positive is worse than target), fill ratio and cancels / replaces per
+# segment
+def summarize(results):
+    totals = collections.defaultdict(lambda: collections.Counter())
+    for r in results:
+        t = totals[r.rule]
+        t["segments"] += 1
+        t["amount"] += r.amount
+        t["filled"] += r.filled
+        t["cancels"] += r.cancels
+        t["replaces"] += r.replaces
+        if r.filled:
+            avg_price = r.notional / r.filled
+            slippage = (avg_price - r.target_price) / r.target_price
+            if r.verb == "sell":
+                slippage = -slippage
+            t["slippage"] += slippage * r.filled
+    summary = {}
+    for rule, t in totals.items():
+        summary[rule] = {
+            "segments": t["segments"],
+            "slippage_bps": (
+                float(t["slippage"] / t["filled"] * 10000)
+                if t["filled"]
+                else None
+            ),
+            "fill_ratio": (
+                float(t["filled"] / t["amount"]) if t["amount"] else None
+            ),
+            "cancels": t["cancels"] / t["segments"],
+            "replaces": t["replaces"] / t["segments"],
+        }
+    return summary
+
+
+def format_summary(summary):
+    lines = [
+        "%-10s %8s %12s %10s %10s %10s"
+        % ("rule", "segments", "slippage_bp", "fill", "cancels", "replaces")
+    ]
+    for rule, s in sorted(summary.items()):
+        lines.append(
+            "%-10s %8d %12s %10s %10.2f %10.2f"
+            % (
+                rule,
+                s["segments"],
+                (
+                    "-"
+                    if s["slippage_bps"] is None
+                    else "%.2f" % s["slippage_bps"]
+                ),
+                "-" if s["fill_ratio"] is None else "%.4f" % s["fill_ratio"],
+                s["cancels"],
+                s["replaces"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a tick tape through priceadjust rules."
+    )
+    parser.add_argument("tape", nargs="?", default="last_with_2s.csv")
+    parser.add_argument(
+        "-r", "--rule", action="append", choices=sorted(priceadjust._RULES)
+    )
+    parser.add_argument("--verb", choices=("buy", "sell"), default="buy")
+    parser.add_argument(
+        "--window", type=int, default=150, help="ticks per trading interval"
+    )
+    parser.add_argument("--notional", type=Decimal, default=Decimal(10000))
+    parser.add_argument(
+        "--spread", type=int, default=1, help="bid/ask spread in pennies"
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="replace live orders instead of cancelling them first",
+    )
+    parser.add_argument(
+        "--fills",
+        choices=sorted(fills.MODELS),
+        default="touch",
+        help="fill model of the simulated broker",
+    )
+    parser.add_argument("-s", "--symbol", action="append")
+    parser.add_argument("-j", "--processes", type=int)
+    args = parser.parse_args(argv)
+
+    segments = make_segments(
+        args.tape,
+        args.rule or DEFAULT_RULES,
+        verb=args.verb,
+        window=args.window,
+        notional=args.notional,
+        spread=args.spread,
+        replace=args.replace,
+        fills=args.fills,
+    )
+    if args.symbol:
+        segments = [s for s in segments if s.asset in args.symbol]
+    print(format_summary(summarize(replay(segments, args.processes))))
+
+
+if __name__ == "__main__":
+    main()
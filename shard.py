@@ -0,0 +1,520 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import pickle
+import traceback
+import weakref
+import zlib
+from decimal import Decimal
+
+import numpy as np
+
+import arraytick
+import priceadjust
+
+# runs one rule over a large basket on several worker processes. The
+# registered orders are split by a hash of their asset; every worker runs
+# the rule on its shard and the orders of all shards are merged back into
+# one set, so to the engine it looks like a single adjuster:
+#
+#   adjuster = ShardedAdjuster(
+#       "delta", c, functools.partial(make_context), shards=8
+#   )
+#   with adjuster:
+#       adjuster.register(orders)
+#       orders = adjuster.get_orders(tick)  # already adjusted
+#       ...
+#
+# close() (or leaving the with block) stops the workers and frees the
+# shared memory; an adjuster that is dropped without it is cleaned up when
+# it is garbage collected, or at the latest when the interpreter exits.
+#
+# the workers have their own copies of the orders. What the rule decides
+# (amounts, prices, cancels, new orders) comes back every tick and is put
+# on the engine's orders; what the engine does to them (posted, actual
+# price, fills) goes to the workers with the next tick. The prices and
+# quotes of a tick go to the workers through shared memory, one float64
+# row each in the column order of self.columns (engines can hand out
+# arraytick.ArrayTick ticks in it), and the order changes come back through
+# a shared buffer per worker.
+#
+# context_factory is called in every worker to make its engine context
+# (adjust_price, adjust_amount, is_wild_price_move, log); it has to be
+# picklable. Quotes are taken from the engine context in the parent, all
+# at once (with c.get_quotes() when there is one) and only for rules that
+# use them (USES_QUOTES), and trading_interval is the parent's. Results are
+# the same as with a single adjuster: rules decide every asset on its own
+# and prices survive the trip through float64 as long as they have up to
+# 15 significant digits.
+
+# what the engine does to an order and what the rule decides about it
+ENGINE_FIELDS = ("posted", "actual_price", "type", "filled", "completed")
+DECISION_FIELDS = (
+    "amount",
+    "desired_price",
+    "desired_type",
+    "_to_cancel",
+    "_stop_loss",
+    "layer",
+    "_layer_locked",
+    "_replaces_filled",
+)
+# only set by some rules
+_RULE_FIELDS = frozenset(
+    ("_stop_loss", "layer", "_layer_locked", "_replaces_filled")
+)
+# bytes of order changes a worker can hand back through shared memory per
+# tick; bigger results go through its pipe
+RESULT_BUFFER = 1 << 22
+
+_PRICE, _BID, _ASK = range(3)
+
+
+def shard_of(asset, shards):
+    return zlib.crc32(asset.encode()) % shards
+
+
+def _decimal(value):
+    return None if value != value else Decimal(repr(value))
+
+
+# engine context of a worker: quotes and the ticker of the current tick
+# come from the parent, everything else from the context made by
+# context_factory
+class _ShardContext:
+    def __init__(self, base, trading_interval):
+        self._base = base
+        self.trading_interval = trading_interval
+        self.tick = {}
+        self.quotes = {}
+
+    def __getattr__(self, name):
+        return getattr(self._base, name)
+
+    def ticker(self):
+        return self.tick
+
+    def get_bid(self, asset):
+        return self.quotes[asset][0]
+
+    def get_ask(self, asset):
+        return self.quotes[asset][1]
+
+    def get_quotes(self, assets):
+        return {a: self.quotes[a] for a in assets if a in self.quotes}
+
+
+# the rule on one shard, in a worker process
+class _Shard:
+    def __init__(self, shard, rule, c, settings, overrides):
+        self.shard = shard
+        self.c = c
+        self.adjuster = priceadjust.get_rules(rule)(c)
+        for name, value in settings.items():
+            setattr(self.adjuster, name, value)
+        if overrides:
+            self.adjuster.param_overrides = dict(overrides)
+        self.reprice = priceadjust.needs_adjust(self.adjuster)
+        self.now = None
+        self.originals = []
+        # id <-> order of everything the parent knows about
+        self.orders = {}
+        self.ids = {}
+        # id -> state last sent to the parent
+        self.sent = {}
+        self._next_id = 0
+
+    def clock(self):
+        return self.now
+
+    def _id(self, o):
+        order_id = self.ids.get(o)
+        if order_id is None:
+            order_id = (self.shard, self._next_id)
+            self._next_id += 1
+            self.ids[o] = order_id
+            self.orders[order_id] = o
+        return order_id
+
+    def _state(self, o):
+        replaces = getattr(o, "_replaces", None)
+        flags = getattr(o, "flags", None)
+        return (
+            o.asset,
+            o.type,
+            tuple(getattr(o, name, None) for name in DECISION_FIELDS),
+            tuple(sorted(flags)) if flags else (),
+            None if replaces is None else self.ids.get(replaces),
+            o.filled,
+            o.completed,
+        )
+
+    def register(self, now, specs):
+        self.now = now
+        self.originals = []
+        for cls, asset, amount, target_price, otype, start_time in specs:
+            o = cls(
+                asset, amount, target_price, time_cb=self.clock, otype=otype
+            )
+            o._start_time = start_time
+            self.originals.append(o)
+        self.adjuster.register(self.originals)
+        return [self._id(o) for o in self.originals]
+
+    def tick(self, now, tick, assets, feedback):
+        self.now = now
+        for order_id, values in feedback:
+            o = self.orders[order_id]
+            for name, value in zip(ENGINE_FIELDS, values):
+                setattr(o, name, value)
+        if assets is None:
+            orders = self.adjuster.get_orders(tick)
+        else:
+            orders = self.adjuster.get_orders(tick, assets)
+        if self.reprice:
+            for o in orders:
+                self.adjuster.adjust(o, tick)
+        # successors first get an id of their own, then the orders they
+        # replace are looked up
+        result = [self._id(o) for o in orders]
+        changed = []
+        for o in (*orders, *self.originals):
+            order_id = self.ids[o]
+            state = self._state(o)
+            if self.sent.get(order_id) != state:
+                self.sent[order_id] = state
+                changed.append((order_id, state))
+        # only what was handed out and the originals are referenced later
+        keep = set(orders).union(self.originals)
+        for o in [o for o in self.ids if o not in keep]:
+            order_id = self.ids.pop(o)
+            del self.orders[order_id]
+            self.sent.pop(order_id, None)
+        return result, changed
+
+
+def _serve(conn, shard, spec):
+    rule, settings, overrides, context_factory, trading_interval = spec[:5]
+    ticks_name, columns, result_name, symbols, positions = spec[5:]
+    ticks_shm = shared_memory.SharedMemory(ticks_name)
+    result_shm = shared_memory.SharedMemory(result_name)
+    try:
+        ticks = np.ndarray((3, columns), np.float64, buffer=ticks_shm.buf)
+        c = _ShardContext(context_factory(), trading_interval)
+        worker = _Shard(shard, rule, c, settings, overrides)
+        while True:
+            message = conn.recv()
+            command = message[0]
+            if command == "close":
+                break
+            try:
+                if command == "register":
+                    conn.send(("ok", worker.register(*message[1:])))
+                    continue
+                now, assets, feedback = message[1:]
+                rows = ticks[:, positions].tolist()
+                tick = {}
+                quotes = {}
+                for s, price, bid, ask in zip(symbols, *rows):
+                    if price == price:
+                        tick[s] = Decimal(repr(price))
+                    if bid == bid or ask == ask:
+                        quotes[s] = (_decimal(bid), _decimal(ask))
+                c.tick = tick
+                c.quotes = quotes
+                payload = pickle.dumps(
+                    worker.tick(now, tick, assets, feedback), protocol=4
+                )
+                if len(payload) <= result_shm.size:
+                    result_shm.buf[: len(payload)] = payload
+                    conn.send(("shm", len(payload)))
+                else:
+                    conn.send(("inline", payload))
+            except Exception:
+                conn.send(("error", traceback.format_exc()))
+    finally:
+        del ticks
+        ticks_shm.close()
+        result_shm.close()
+        conn.close()
+
+
+# stop the workers and free the shared memory of a ShardedAdjuster
+def _release(workers, shms):
+    for _, process, conn, result_shm in workers:
+        try:
+            conn.send(("close",))
+        except (BrokenPipeError, OSError):
+            pass
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        conn.close()
+        result_shm.close()
+        result_shm.unlink()
+    workers.clear()
+    for shm in shms:
+        try:
+            shm.close()
+        except BufferError:
+            # still mapped by an array of a collected adjuster; the mapping
+            # goes with the process, the name can go now
+            pass
+        shm.unlink()
+    shms.clear()
+
+
+class ShardedAdjuster:
+    def __init__(
+        self,
+        rule,
+        c,
+        context_factory,
+        shards=None,
+        settings=None,
+        param_overrides=None,
+    ):
+        # settings: class attributes of the rule to override on every
+        # shard, e.g. {"REPLACE_ORDERS": True}
+        self.rule = rule
+        self.c = c
+        self.context_factory = context_factory
+        self.shards = shards or os.cpu_count() or 1
+        self.settings = dict(settings or {})
+        self.param_overrides = dict(param_overrides or {})
+        self.uses_quotes = self.settings.get(
+            "USES_QUOTES", priceadjust.get_rules(rule).USES_QUOTES
+        )
+        self.columns = None
+        self.all_orders = []
+        self._original_orders = {}
+        self._workers = []
+        self._ticks_shm = None
+        self._ticks = None
+        # releases the workers and shared memory of the last register()
+        self._finalizer = None
+        # order id -> engine order, and back
+        self._orders = {}
+        self._ids = {}
+        # ids handed out to the engine; the engine owns their fills
+        self._handed_out = set()
+        # shard -> ids handed out on the last tick; id -> engine state
+        # last sent to the shard
+        self._results = {}
+        self._sent = {}
+
+    def _now(self):
+        for o in self._original_orders.values():
+            return o.time_cb()
+
+    def register(self, orders):
+        self.close()
+        self.all_orders = list(orders)
+        self._original_orders = {}
+        for o in self.all_orders:
+            self._original_orders.setdefault(o.asset, o)
+        self.columns = arraytick.Columns(self._original_orders.values())
+        self._orders = {}
+        self._ids = {}
+        self._handed_out = set()
+        self._results = {}
+        self._sent = {}
+
+        by_shard = {}
+        for o in self.all_orders:
+            by_shard.setdefault(shard_of(o.asset, self.shards), []).append(o)
+        self._ticks_shm = shared_memory.SharedMemory(
+            create=True, size=max(24, 24 * len(self.columns))
+        )
+        self._ticks = np.ndarray(
+            (3, len(self.columns)), np.float64, buffer=self._ticks_shm.buf
+        )
+        # no quotes unless the rule uses them
+        self._ticks[_BID] = self._ticks[_ASK] = float("nan")
+        # the lists are filled in below; the finalizer must not refer to
+        # self, or self would never be collected
+        self._workers = []
+        self._finalizer = weakref.finalize(
+            self, _release, self._workers, [self._ticks_shm]
+        )
+        mp = multiprocessing.get_context()
+        for shard, shard_orders in sorted(by_shard.items()):
+            symbols = list(dict.fromkeys(o.asset for o in shard_orders))
+            result_shm = shared_memory.SharedMemory(
+                create=True, size=RESULT_BUFFER
+            )
+            conn, child = mp.Pipe()
+            spec = (
+                self.rule,
+                self.settings,
+                self.param_overrides,
+                self.context_factory,
+                self.c.trading_interval,
+                self._ticks_shm.name,
+                len(self.columns),
+                result_shm.name,
+                symbols,
+                self.columns.positions(symbols),
+            )
+            process = mp.Process(
+                target=_serve, args=(child, shard, spec), daemon=True
+            )
+            process.start()
+            child.close()
+            self._workers.append((shard, process, conn, result_shm))
+            self._results[shard] = []
+
+        now = self._now()
+        for shard, _, conn, _ in self._workers:
+            specs = [
+                (
+                    o.__class__,
+                    o.asset,
+                    o.amount,
+                    o.target_price,
+                    o.type,
+                    o._start_time,
+                )
+                for o in by_shard[shard]
+            ]
+            conn.send(("register", now, specs))
+        for shard, _, conn, _ in self._workers:
+            for o, order_id in zip(by_shard[shard], self._receive(conn)):
+                self._orders[order_id] = o
+                self._ids[o] = order_id
+
+    def _receive(self, conn):
+        status, value = conn.recv()
+        if status == "error":
+            raise RuntimeError("adjuster shard failed:\n%s" % value)
+        return value
+
+    def _write_tick(self, tick):
+        symbols = self.columns.symbols
+        if getattr(tick, "columns", None) is self.columns:
+            self._ticks[_PRICE] = tick.prices
+        else:
+            self._ticks[_PRICE] = [float(tick.get(s, "nan")) for s in symbols]
+        if not self.uses_quotes:
+            return
+        get_quotes = getattr(self.c, "get_quotes", None)
+        if get_quotes is not None:
+            quotes = get_quotes(symbols)
+        else:
+            quotes = {
+                s: (self.c.get_bid(s), self.c.get_ask(s))
+                for s in symbols
+                if s in tick
+            }
+        nan = float("nan")
+        bid_ask = [quotes.get(s, (None, None)) for s in symbols]
+        self._ticks[_BID] = [
+            nan if b is None else float(b) for b, _ in bid_ask
+        ]
+        self._ticks[_ASK] = [
+            nan if a is None else float(a) for _, a in bid_ask
+        ]
+
+    def _feedback(self, shard):
+        feedback = []
+        for order_id in self._results[shard]:
+            o = self._orders[order_id]
+            values = tuple(getattr(o, name) for name in ENGINE_FIELDS)
+            if self._sent.get(order_id) != values:
+                self._sent[order_id] = values
+                feedback.append((order_id, values))
+        return feedback
+
+    def _apply(self, order_id, state):
+        asset, otype, decision, flags, _, filled, completed = state
+        o = self._orders.get(order_id)
+        if o is None:
+            proto = self._original_orders[asset]
+            o = proto.__class__(
+                asset,
+                decision[0],
+                proto.target_price,
+                time_cb=proto.time_cb,
+                otype=otype,
+            )
+            self._orders[order_id] = o
+            self._ids[o] = order_id
+        for name, value in zip(DECISION_FIELDS, decision):
+            if value is None and name in _RULE_FIELDS:
+                continue
+            setattr(o, name, value)
+        current = getattr(o, "flags", None)
+        if current is not None or flags:
+            for flag in set(current or ()) - set(flags):
+                o.remove_flag(flag)
+            for flag in set(flags) - set(current or ()):
+                o.add_flag(flag)
+        if order_id not in self._handed_out:
+            # accounting of the rule, e.g. fills put on the original order
+            o.filled = filled
+            o.completed = completed
+
+    # assets, when given, limits the evaluation to them as with a single
+    # adjuster (see events.py)
+    def get_orders(self, tick, assets=None):
+        self._write_tick(tick)
+        now = self._now()
+        for shard, _, conn, _ in self._workers:
+            shard_assets = assets
+            if assets is not None:
+                shard_assets = {
+                    a for a in assets if shard_of(a, self.shards) == shard
+                }
+            conn.send(("tick", now, shard_assets, self._feedback(shard)))
+
+        orders = set()
+        replaces = []
+        for shard, _, conn, result_shm in self._workers:
+            status, value = conn.recv()
+            if status == "error":
+                raise RuntimeError("adjuster shard failed:\n%s" % value)
+            if status == "shm":
+                value = bytes(result_shm.buf[:value])
+            result, changed = pickle.loads(value)
+            for order_id, state in changed:
+                self._apply(order_id, state)
+                if state[4] is not None:
+                    replaces.append((order_id, state[4]))
+            self._handed_out.update(result)
+            self._results[shard] = result
+            orders.update(self._orders[i] for i in result)
+        for order_id, replaced_id in replaces:
+            replaced = self._orders.get(replaced_id)
+            if replaced is not None:
+                self._orders[order_id]._replaces = replaced
+        self._forget(orders)
+        return orders
+
+    def _forget(self, orders):
+        # the workers only refer to what they handed out and the originals
+        keep = set(orders).union(self.all_orders)
+        for o in [o for o in self._ids if o not in keep]:
+            order_id = self._ids.pop(o)
+            del self._orders[order_id]
+            self._handed_out.discard(order_id)
+            self._sent.pop(order_id, None)
+
+    # orders come back from get_orders() already adjusted by their shard
+    def adjust(self, o, tick):
+        pass
+
+    def close(self):
+        # the array has to go before its shared memory can be closed
+        self._ticks = None
+        self._ticks_shm = None
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
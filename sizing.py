@@ -0,0 +1,83 @@
+import numpy as np
+
+# the vectorized curves work in float64 while the adjusters use Decimal;
+# results agree with the Decimal reference within this relative tolerance
+# (absolute for values around zero)
+RTOL = 1e-9
+ATOL = 1e-12
+
+
+def new_delta_s1(params, remaining, amount, delta, remaining_time, count1):
+    # vectorized _NewDelta._get_s1(): all arguments but params and
+    # remaining_time are arrays with one element per asset
+    remaining = np.asarray(remaining, dtype=np.float64)
+    amount = np.asarray(amount, dtype=np.float64)
+    delta = np.asarray(delta, dtype=np.float64)
+    count1 = np.asarray(count1, dtype=np.float64)
+
+    # make sure we don't ever divide by zero
+    half_time = max(1.0, float(remaining_time)) / 2
+    v_t = (
+        float(params.A1)
+        * (remaining / amount) ** float(params.L1)
+        / (float(params.A2) * half_time ** float(params.L2))
+        * float(params.A3)
+        * count1
+    ) / amount
+
+    abs_delta = np.abs(delta)
+    negative = np.maximum(
+        v_t, float(params.ParN1) * abs_delta ** float(params.expN1)
+    )
+    positive = np.maximum(
+        v_t, float(params.ParP1) * abs_delta ** float(params.expP1)
+    )
+    positive[delta > float(params.delta_bad_cap)] = 0.0
+    return np.select(
+        [delta < 0, delta > 0], [negative, positive], float(params.ParZ)
+    )
+
+
+def new_delta_s1_for(adjuster, tick, assets=None):
+    # gather the per-asset inputs of a registered _NewDelta adjuster and size
+    # all of its assets (or just the given ones) in one call
+    if assets is None:
+        assets = list(adjuster._original_orders)
+    orders = [adjuster._get_original_order(a) for a in assets]
+    columns = adjuster.columns
+    if columns is not None and getattr(tick, "columns", None) is columns:
+        # an arraytick.ArrayTick in the adjuster's columns
+        delta = tick.delta()
+        amount = columns.amount
+        if len(assets) != len(columns):
+            positions = columns.positions(assets)
+            delta = delta[positions]
+            amount = amount[positions]
+    else:
+        target = np.fromiter(
+            (float(o.target_price) for o in orders), np.float64, len(orders)
+        )
+        price = np.fromiter((float(tick[a]) for a in assets), np.float64)
+        sign = np.fromiter(
+            (-1.0 if o.verb == "sell" else 1.0 for o in orders), np.float64
+        )
+        delta = (price - target) / target * 100 * sign
+        amount = [float(o.amount) for o in orders]
+    S1 = new_delta_s1(
+        adjuster.params,
+        [float(o.remaining) for o in orders],
+        amount,
+        delta,
+        adjuster.remaining_time,
+        [adjuster.count1[a] for a in assets],
+    )
+    return assets, S1
+
+
+def matches_reference(adjuster, tick, assets=None):
+    # check the vectorized curve against the Decimal reference path
+    assets, S1 = new_delta_s1_for(adjuster, tick, assets)
+    reference = np.array(
+        [float(adjuster._get_s1(a, tick)) for a in assets], np.float64
+    )
+    return bool(np.allclose(S1, reference, rtol=RTOL, atol=ATOL))
@@ -0,0 +1,344 @@
+import argparse
+import collections
+from decimal import Decimal
+import hashlib
+import itertools
+import json
+import os
+import random
+import sqlite3
+
+from blade import config
+
+import priceadjust
+import replay
+
+TUNABLE_RULES = ("delta", "newdelta")
+
+
+# parameter space from "key=v1,v2,..." (grid values) or "key=lo:hi" (range
+# for random samples) specs; values are kept as text so that they can be
+# fed to the rule's config factories and written back to a config section
+def parse_space(specs):
+    space = {}
+    for spec in specs:
+        key, _, values = spec.partition("=")
+        if not values:
+            raise ValueError("expected key=values, got %r" % spec)
+        if ":" in values:
+            lo, hi = values.split(":")
+            space[key.strip()] = (Decimal(lo), Decimal(hi))
+        else:
+            space[key.strip()] = [v.strip() for v in values.split(",")]
+    return space
+
+
+def check_space(rule, space):
+    known = priceadjust.get_rules(rule).PARAMS
+    unknown = set(space) - set(known)
+    if unknown:
+        raise ValueError(
+            "unknown %s parameters: %s" % (rule, ", ".join(sorted(unknown)))
+        )
+
+
+def grid(space):
+    keys = sorted(space)
+    for key in keys:
+        if isinstance(space[key], tuple):
+            raise ValueError("%s is a range; use random sampling" % key)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_samples(space, n, seed=0):
+    rng = random.Random(seed)
+    keys = sorted(space)
+    for _ in range(n):
+        params = {}
+        for key in keys:
+            values = space[key]
+            if isinstance(values, tuple):
+                lo, hi = values
+                value = lo + (hi - lo) * Decimal(repr(rng.random()))
+                params[key] = str(value.quantize(Decimal("0.0001")))
+            else:
+                params[key] = rng.choice(values)
+        yield params
+
+
+# modules a replayed segment runs through
+REPLAY_MODULES = (
+    "priceadjust",
+    "replay",
+    "fills",
+    "tape",
+    "coalesce",
+    "sizing",
+    "arraytick",
+)
+
+
+def _code_fingerprint():
+    h = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(priceadjust.__file__))
+    for name in REPLAY_MODULES:
+        with open(os.path.join(directory, name + ".py"), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+# the values a rule runs with: the overrides, then the current config, as
+# the rule's factories read them ("0.1" and "0.10" are different Decimals
+# but the same float); None for keys the config doesn't have either
+def effective_params(rule, overrides):
+    cls = priceadjust.get_rules(rule)
+    values = {}
+    for key, factory in getattr(cls, "PARAMS", {}).items():
+        if key in overrides:
+            value = factory(overrides[key])
+        else:
+            try:
+                value = config.get_from_config(
+                    key=key, section=cls.DELTA_SECTION, factory=factory
+                )
+            except Exception:
+                value = None
+        values[key] = None if value is None else str(value)
+    return values
+
+
+# per segment results of previous runs; keyed by everything that determines
+# a segment's outcome, including the tape's size/mtime, the parameter values
+# after config resolution and the source of the modules on the replay path,
+# so that reruns only replay what changed
+class ResultCache:
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, result TEXT)"
+        )
+        self._code = _code_fingerprint()
+        self._stamps = {}
+        self._params = {}
+
+    def _effective_params(self, rule, params):
+        key = (rule, tuple(sorted(params)))
+        if key not in self._params:
+            self._params[key] = effective_params(rule, dict(params))
+        return self._params[key]
+
+    def _stamp(self, path):
+        if path not in self._stamps:
+            st = os.stat(path)
+            self._stamps[path] = [
+                os.path.basename(path),
+                st.st_size,
+                st.st_mtime_ns,
+            ]
+        return self._stamps[path]
+
+    def key(self, segment):
+        fields = segment._asdict()
+        fields["tape"] = self._stamp(segment.tape)
+        fields["notional"] = str(segment.notional)
+        fields["params"] = self._effective_params(segment.rule, segment.params)
+        fields["code"] = self._code
+        return hashlib.sha1(
+            json.dumps(fields, sort_keys=True).encode()
+        ).hexdigest()
+
+    def get(self, segment):
+        row = self._db.execute(
+            "SELECT result FROM results WHERE key = ?", (self.key(segment),)
+        ).fetchone()
+        if row is None:
+            return None
+        fields = json.loads(row[0])
+        for name in ("target_price", "amount", "filled", "notional"):
+            fields[name] = Decimal(fields[name])
+        return replay.SegmentResult(**fields)
+
+    def put(self, segment, result):
+        fields = result._asdict()
+        for name in ("target_price", "amount", "filled", "notional"):
+            fields[name] = str(fields[name])
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?)",
+            (self.key(segment), json.dumps(fields)),
+        )
+
+    def commit(self):
+        self._db.commit()
+
+
+def evaluate(segments, candidates, cache=None, processes=None):
+    # replay every segment for every candidate; returns a summary (see
+    # replay.summarize) per candidate, in order
+    jobs = []
+    for n, params in enumerate(candidates):
+        frozen = tuple(sorted(params.items()))
+        for segment in segments:
+            jobs.append((n, segment._replace(params=frozen)))
+
+    results = collections.defaultdict(list)
+    missing = []
+    for n, segment in jobs:
+        result = cache.get(segment) if cache is not None else None
+        if result is None:
+            missing.append((n, segment))
+        else:
+            results[n].append(result)
+    if missing:
+        fresh = replay.replay([s for _, s in missing], processes)
+        for (n, segment), result in zip(missing, fresh):
+            results[n].append(result)
+            if cache is not None:
+                cache.put(segment, result)
+        if cache is not None:
+            cache.commit()
+
+    summaries = []
+    for n in range(len(candidates)):
+        summary = replay.summarize(results[n])
+        summaries.append(next(iter(summary.values()), None))
+    return summaries
+
+
+# lower is better: slippage of what was filled plus a fixed cost (in basis
+# points) for the unfilled part of the orders
+def score(summary, unfilled_cost=100):
+    if summary is None or not summary["fill_ratio"]:
+        return float("inf")
+    fill = summary["fill_ratio"]
+    return summary["slippage_bps"] * fill + unfilled_cost * (1 - fill)
+
+
+def rank(candidates, summaries, unfilled_cost=100):
+    rows = [
+        (score(s, unfilled_cost), params, s)
+        for params, s in zip(candidates, summaries)
+    ]
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def format_ranking(rows, limit=20):
+    keys = sorted({k for _, params, _ in rows for k in params})
+    lines = [
+        " ".join(
+            ["%4s" % "#", "%9s" % "score", "%9s" % "slip_bp", "%7s" % "fill"]
+            + ["%10s" % k for k in keys]
+        )
+    ]
+    for n, (value, params, s) in enumerate(rows[:limit], 1):
+        if s is None or s["slippage_bps"] is None:
+            continue
+        lines.append(
+            " ".join(
+                [
+                    "%4d" % n,
+                    "%9.3f" % value,
+                    "%9.3f" % s["slippage_bps"],
+                    "%7.4f" % s["fill_ratio"],
+                ]
+                + ["%10s" % params[k] for k in keys]
+            )
+        )
+    return "\n".join(lines)
+
+
+# config section with the swept parameters replaced; the remaining
+# parameters are taken from the current config
+def config_section(rule, params):
+    cls = priceadjust.get_rules(rule)
+    values = {}
+    for key, factory in cls.PARAMS.items():
+        if key in params:
+            values[key] = params[key]
+        else:
+            try:
+                values[key] = config.get_from_config(
+                    key=key, section=cls.DELTA_SECTION, factory=str
+                )
+            except Exception:
+                # not set in the current config either
+                continue
+    lines = ["[%s]" % cls.DELTA_SECTION]
+    lines += ["%s = %s" % (k, v) for k, v in values.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep [delta]/[newdelta] parameters over tick tapes."
+    )
+    parser.add_argument("tape", nargs="*", default=["last_with_2s.csv"])
+    parser.add_argument("-r", "--rule", choices=TUNABLE_RULES, default="delta")
+    parser.add_argument(
+        "-p",
+        "--param",
+        action="append",
+        required=True,
+        help="key=v1,v2,... for grid values or key=lo:hi for a range",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        help="evaluate this many random samples instead of the full grid",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verb", choices=("buy", "sell"), default="buy")
+    parser.add_argument("--window", type=int, default=150)
+    parser.add_argument("--notional", type=Decimal, default=Decimal(10000))
+    parser.add_argument("--spread", type=int, default=1)
+    parser.add_argument("-s", "--symbol", action="append")
+    parser.add_argument(
+        "--stride",
+        type=int,
+        default=1,
+        help="only replay every n-th window of each symbol",
+    )
+    parser.add_argument("--unfilled-cost", type=float, default=100)
+    parser.add_argument("--cache", default="sweep_cache.sqlite")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("-j", "--processes", type=int)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    space = parse_space(args.param)
+    check_space(args.rule, space)
+    if args.samples:
+        candidates = list(random_samples(space, args.samples, args.seed))
+    else:
+        candidates = list(grid(space))
+
+    segments = []
+    for path in args.tape:
+        segments += replay.make_segments(
+            path,
+            [args.rule],
+            verb=args.verb,
+            window=args.window,
+            notional=args.notional,
+            spread=args.spread,
+        )
+    if args.symbol:
+        segments = [s for s in segments if s.asset in args.symbol]
+    if args.stride > 1:
+        segments = [
+            s for s in segments if (s.start // args.window) % args.stride == 0
+        ]
+
+    cache = None if args.no_cache else ResultCache(args.cache)
+    summaries = evaluate(segments, candidates, cache, args.processes)
+    rows = rank(candidates, summaries, args.unfilled_cost)
+    print(format_ranking(rows, args.top))
+    if rows and rows[0][0] != float("inf"):
+        print()
+        print(config_section(args.rule, rows[0][1]))
+
+
+if __name__ == "__main__":
+    main()
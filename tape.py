@@ -0,0 +1,142 @@
+import csv
+from decimal import Decimal
+import functools
+import gzip
+import json
+import os
+
+import numpy as np
+
+# tick tapes have one column per symbol and one row per snapshot, like
+# last_with_2s.csv or the gzipped files of recorder.py; the first time a
+# tape is loaded it is converted into a binary columnar cache next to it (a
+# float64 matrix after a small JSON header) that is memory-mapped on later
+# loads
+
+MAGIC = b"TICKTAPE1\n"
+CACHE_SUFFIX = ".tape"
+ALIGNMENT = 64
+
+
+class Tape:
+    def __init__(self, symbols, prices, path=None):
+        self.symbols = list(symbols)
+        self.prices = prices
+        self.path = path
+        self._columns = {s: i for i, s in enumerate(self.symbols)}
+
+    def __len__(self):
+        return self.prices.shape[0]
+
+    def column(self, symbol):
+        return self.prices[:, self._columns[symbol]]
+
+    def _select(self, symbols):
+        if symbols is None:
+            return self.symbols, slice(None)
+        return list(symbols), [self._columns[s] for s in symbols]
+
+    # snapshots as arrays (views into the memory-mapped matrix where
+    # possible), one row per snapshot
+    def iter_arrays(self, start=0, stop=None, symbols=None):
+        _, columns = self._select(symbols)
+        for row in self.prices[start:stop]:
+            yield row[columns]
+
+    # snapshots as `tick` mappings of symbol to Decimal, the way the
+    # adjusters index them; missing prices are left out
+    def iter_ticks(self, start=0, stop=None, symbols=None):
+        symbols, _ = self._select(symbols)
+        for row in self.iter_arrays(start, stop, symbols):
+            yield {
+                s: Decimal(repr(p))
+                for s, p in zip(symbols, row.tolist())
+                if p == p
+            }
+
+    def tick(self, n, symbols=None):
+        return next(self.iter_ticks(n, n + 1, symbols))
+
+
+def _parse_price(text):
+    text = text.strip()
+    return float(text) if text else float("nan")
+
+
+def _open_csv(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, newline="")
+
+
+def read_csv(path):
+    with _open_csv(path) as f:
+        reader = csv.reader(f)
+        symbols = next(reader)
+        rows = [[_parse_price(p) for p in row] for row in reader if row]
+    return Tape(symbols, np.array(rows, dtype=np.float64), path)
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def write_cache(tape, cache_path, source=None):
+    header = {
+        "symbols": tape.symbols,
+        "shape": list(tape.prices.shape),
+        "source": source,
+    }
+    header = MAGIC + json.dumps(header).encode() + b"\n"
+    header += b" " * (-len(header) % ALIGNMENT)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(np.ascontiguousarray(tape.prices, dtype="<f8").tobytes())
+    os.replace(tmp_path, cache_path)
+
+
+def _read_header(f):
+    if f.readline() != MAGIC:
+        raise ValueError("%s is not a tick tape cache" % f.name)
+    header = json.loads(f.readline())
+    offset = f.tell()
+    return header, offset + (-offset % ALIGNMENT)
+
+
+def open_cache(cache_path):
+    with open(cache_path, "rb") as f:
+        header, offset = _read_header(f)
+    prices = np.memmap(
+        cache_path,
+        dtype="<f8",
+        mode="r",
+        offset=offset,
+        shape=tuple(header["shape"]),
+    )
+    return Tape(header["symbols"], prices, cache_path), header
+
+
+def load(path, cache=True):
+    if not cache:
+        return read_csv(path)
+    cache_path = path + CACHE_SUFFIX
+    source = _source_stamp(path)
+    if os.path.exists(cache_path):
+        try:
+            tape, header = open_cache(cache_path)
+        except ValueError:
+            pass
+        else:
+            if header["source"] == source:
+                return tape
+    write_cache(read_csv(path), cache_path, source)
+    return open_cache(cache_path)[0]
+
+
+# per process cache of opened tapes, for workers replaying many segments of
+# the same file
+@functools.lru_cache(maxsize=8)
+def load_shared(path):
+    return load(path)
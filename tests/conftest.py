@@ -0,0 +1,78 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+# the modules live at the top of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# parameters of the delta rules, so that tests don't depend on a config file
+PARAMS = {
+    "delta": dict(
+        GracePeriod="20",
+        ParN1="0.019",
+        expN1="0.311",
+        denN1="1",
+        ParZ="0.021",
+        ParP="0.008",
+        expP1="0.4",
+        amount_threshold="0.1",
+        price_threshold="0.001",
+        A1="0.05",
+        L1="1",
+        L2="0.5",
+        delta_bad_cap="0.28",
+        delta_good_cap="-0.4",
+    ),
+    "newdelta": dict(
+        ParN1="0.019",
+        expN1="0.311",
+        ParZ="0.021",
+        ParP1="0.008",
+        expP1="0.4",
+        amount_threshold="0.1",
+        price_threshold="0.001",
+        A1="1",
+        A2="1",
+        A3="0.01",
+        L1="1",
+        L2="0.5",
+        delta_bad_cap="0.28",
+    ),
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime.datetime(2000, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += datetime.timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+# a rule over replay.SimContext with the parameters above
+@pytest.fixture
+def make_adjuster():
+    priceadjust = pytest.importorskip("priceadjust")
+    replay = pytest.importorskip("replay")
+
+    def make(rule, trading_interval=120, **attrs):
+        c = replay.SimContext(trading_interval)
+        adjuster = priceadjust.get_rules(rule)(c)
+        if rule in PARAMS:
+            adjuster.param_overrides = dict(PARAMS[rule])
+        for name, value in attrs.items():
+            setattr(adjuster, name, value)
+        return adjuster
+
+    return make
@@ -0,0 +1,119 @@
+from decimal import Decimal
+import math
+
+import pytest
+
+pytest.importorskip("blade")
+np = pytest.importorskip("numpy")
+
+import arraytick  # noqa: E402
+import priceadjust  # noqa: E402
+import replay  # noqa: E402
+import sizing  # noqa: E402
+
+ASSETS = ("A", "B", "C", "D")
+TARGETS = ("10.00", "41.41", "227.95", "0.5123")
+
+
+def _orders(clock):
+    return [
+        replay.ORDER_CLASSES["sell" if i % 2 else "buy"](
+            a, Decimal(100), Decimal(target), clock
+        )
+        for i, (a, target) in enumerate(zip(ASSETS, TARGETS))
+    ]
+
+
+def _rows(n=40, seed=1, missing=0.05):
+    # random walks around the targets, with the odd missing price
+    rng = np.random.default_rng(seed)
+    start = np.array([float(t) for t in TARGETS])
+    walk = np.cumsum(rng.normal(0, 0.002, (n, len(ASSETS))), axis=0)
+    rows = np.round(start * (1 + walk), 4)
+    rows[rng.random(rows.shape) < missing] = np.nan
+    return rows
+
+
+def test_mapping(clock):
+    columns = arraytick.Columns(_orders(clock))
+    tick = arraytick.ArrayTick(columns, [10.01, float("nan"), 228.0, 0.5])
+    assert list(tick) == ["A", "C", "D"]
+    assert len(tick) == 3
+    assert "B" not in tick and "X" not in tick and "A" in tick
+    assert tick["A"] == Decimal("10.01")
+    assert tick.get("B") is None
+    with pytest.raises(KeyError):
+        tick["B"]
+    assert dict(tick) == {
+        "A": Decimal("10.01"),
+        "C": Decimal("228.0"),
+        "D": Decimal("0.5"),
+    }
+    # only what was looked up was converted
+    assert set(tick._decimals) == {"A", "C", "D"}
+
+
+def test_from_mapping(clock):
+    columns = arraytick.Columns(_orders(clock))
+    tick = {"A": Decimal("10.01"), "C": Decimal("228")}
+    assert dict(arraytick.ArrayTick.from_mapping(columns, tick)) == tick
+
+
+def test_delta_matches_decimal_path(make_adjuster, clock):
+    adjuster = make_adjuster("newdelta", ARRAY_TICKS=True)
+    adjuster.register(_orders(clock))
+    reference = make_adjuster("newdelta")
+    reference.register(_orders(clock))
+    for row in _rows():
+        tick = arraytick.ArrayTick(adjuster.columns, row)
+        for asset in tick:
+            expected = reference._get_delta(asset, dict(tick))
+            assert math.isclose(
+                adjuster._get_delta(asset, tick),
+                expected,
+                rel_tol=sizing.RTOL,
+                abs_tol=sizing.ATOL,
+            )
+
+
+@pytest.mark.parametrize("rule", ["delta", "newdelta"])
+def test_rules_decide_the_same(make_adjuster, clock, rule):
+    def run(array_ticks):
+        run_clock = type(clock)()
+        adjuster = make_adjuster(rule, ARRAY_TICKS=array_ticks)
+        adjuster.register(_orders(run_clock))
+        broker = replay.SimBroker()
+        trace = []
+        # the rules expect a price for every asset
+        for row in _rows(missing=0):
+            tick = {
+                a: Decimal(repr(p))
+                for a, p in zip(ASSETS, row.tolist())
+                if p == p
+            }
+            if array_ticks:
+                tick = arraytick.ArrayTick(adjuster.columns, row)
+            adjuster.c.tick = tick
+            broker.match(tick)
+            orders = adjuster.get_orders(tick)
+            broker.sync(orders)
+            trace.append(
+                sorted(
+                    (o.asset, o.amount, o.desired_price, o.posted)
+                    for o in orders
+                )
+            )
+            run_clock.advance(replay.TICK_PERIOD)
+        return trace, dict(broker.filled)
+
+    assert run(True) == run(False)
+
+
+def test_batch_sizing_on_array_ticks(make_adjuster, clock):
+    adjuster = make_adjuster("newdelta", ARRAY_TICKS=True)
+    adjuster.register(_orders(clock))
+    for row in _rows():
+        tick = arraytick.ArrayTick(adjuster.columns, row)
+        assets = list(tick)
+        assert sizing.matches_reference(adjuster, tick, assets)
+    assert priceadjust.needs_adjust(adjuster) is False
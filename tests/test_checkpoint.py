@@ -0,0 +1,108 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import checkpoint  # noqa: E402
+import priceadjust  # noqa: E402
+import replay  # noqa: E402
+
+ASSETS = ("X", "Y", "Z")
+PRICES = ["10.00", "9.98", "10.03", "9.95", "9.90", "10.02", "9.97", "9.93"]
+
+
+def _orders(clock):
+    return [
+        replay.SimBuyOrder(a, Decimal(100), Decimal("10.00"), clock)
+        for a in ASSETS
+    ]
+
+
+def _tick(price):
+    return {a: Decimal(price) for a in ASSETS}
+
+
+def _state(orders):
+    return sorted(
+        (
+            o.asset,
+            o.amount,
+            o.filled,
+            o.desired_price,
+            o.desired_type,
+            o._to_cancel,
+            getattr(o, "_replaces", None) is not None,
+        )
+        for o in orders
+    )
+
+
+@pytest.mark.parametrize("rule", ["delta", "newdelta", "askbid"])
+def test_round_trip(make_adjuster, clock, tmp_path, rule):
+    path = str(tmp_path / "basket.journal")
+    adjuster = make_adjuster(rule, REPLACE_ORDERS=True)
+    orders = _orders(clock)
+    adjuster.register(orders)
+    journal = checkpoint.Journal(path)
+    journal.start(adjuster, rule, orders)
+    broker = replay.SimBroker()
+    for price in PRICES:
+        tick = _tick(price)
+        adjuster.c.tick = tick
+        broker.match(tick)
+        handed_out = adjuster.get_orders(tick)
+        if priceadjust.needs_adjust(adjuster):
+            for o in handed_out:
+                adjuster.adjust(o, tick)
+        broker.sync(handed_out)
+        journal.record(adjuster)
+        clock.advance(replay.TICK_PERIOD)
+    journal.close()
+    assert sum(broker.filled.values()) > 0
+
+    # after a restart: fresh original orders, the same context
+    restored = checkpoint.restore(path, adjuster.c, _orders(clock))
+    assert type(restored) is type(adjuster)
+    assert _state(restored.all_orders) == _state(adjuster.all_orders)
+    assert _state(restored.pending_orders) == _state(adjuster.pending_orders)
+    for name in adjuster.CHECKPOINT_ATTRS:
+        assert getattr(restored, name) == getattr(adjuster, name)
+    assert [o.filled for o in restored._original_orders.values()] == [
+        o.filled for o in adjuster._original_orders.values()
+    ]
+
+
+def test_torn_record_is_ignored(make_adjuster, clock, tmp_path):
+    path = str(tmp_path / "basket.journal")
+    adjuster = make_adjuster("delta")
+    orders = _orders(clock)
+    adjuster.register(orders)
+    journal = checkpoint.Journal(path)
+    journal.start(adjuster, "delta", orders)
+    tick = _tick("9.95")
+    adjuster.c.tick = tick
+    adjuster.get_orders(tick)
+    journal.record(adjuster)
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00garbage")
+
+    restored = checkpoint.restore(path, adjuster.c, _orders(clock))
+    assert _state(restored.pending_orders) == _state(adjuster.pending_orders)
+
+
+def test_mismatched_orders_are_rejected(make_adjuster, clock, tmp_path):
+    path = str(tmp_path / "basket.journal")
+    adjuster = make_adjuster("delta")
+    orders = _orders(clock)
+    adjuster.register(orders)
+    journal = checkpoint.Journal(path)
+    journal.start(adjuster, "delta", orders)
+    journal.close()
+    other = [
+        replay.SimSellOrder(a, Decimal(100), Decimal("10.00"), clock)
+        for a in ASSETS
+    ]
+    with pytest.raises(ValueError):
+        checkpoint.restore(path, adjuster.c, other)
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import replay  # noqa: E402
+
+
+def _counters(make_adjuster, clock, ticks, **attrs):
+    adjuster = make_adjuster("newdelta", **attrs)
+    orders = [
+        replay.SimBuyOrder(a, Decimal(100), Decimal("10.00"), clock)
+        for a in ("X", "Y")
+    ]
+    adjuster.register(orders)
+    counters = []
+    for _ in range(ticks):
+        # the price stays above the target, nothing fills
+        tick = {"X": Decimal("10.50"), "Y": Decimal("10.50")}
+        adjuster.c.tick = tick
+        adjuster.get_orders(tick)
+        counters.append(dict(adjuster.count1))
+        clock.advance(replay.TICK_PERIOD)
+    return counters
+
+
+def test_per_call_counters(make_adjuster, clock):
+    counters = _counters(make_adjuster, clock, 4)
+    assert [c["X"] for c in counters] == [2, 3, 4, 5]
+
+
+# one call per period escalates exactly like one step per call
+def test_clock_counters_match_per_call_counters(make_adjuster, clock):
+    expected = _counters(make_adjuster, type(clock)(), 6)
+    counters = _counters(
+        make_adjuster, clock, 6, ESCALATION_PERIOD=replay.TICK_PERIOD
+    )
+    assert counters == expected
+
+
+def test_clock_counters_follow_time_not_calls(make_adjuster, clock):
+    counters = _counters(
+        make_adjuster, clock, 4, ESCALATION_PERIOD=2 * replay.TICK_PERIOD
+    )
+    assert [c["X"] for c in counters] == [2, Decimal("2.5"), 3, Decimal("3.5")]
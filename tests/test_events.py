@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import events  # noqa: E402
+import replay  # noqa: E402
+
+
+def _trigger(make_adjuster, clock, **kwargs):
+    adjuster = make_adjuster("newdelta")
+    adjuster.register(
+        [
+            replay.SimBuyOrder(a, Decimal(100), Decimal("10.00"), clock)
+            for a in ("X", "Y")
+        ]
+    )
+    return events.EventTrigger(adjuster, **kwargs)
+
+
+def _burst(trigger, clock, updates, seconds):
+    # updates on X only, spread over seconds of clock; Y stays quiet
+    for i in range(updates):
+        price = Decimal("10.50") + Decimal((i + 1) % 2) / 100
+        trigger.adjuster.c.tick = dict(trigger.tick, X=price)
+        trigger.on_tick({"X": price})
+        clock.advance(seconds / updates)
+
+
+def test_escalates_by_the_clock(make_adjuster, clock):
+    trigger = _trigger(make_adjuster, clock)
+    trigger.on_tick({"X": Decimal("10.50"), "Y": Decimal("10.50")})
+    adjuster = trigger.adjuster
+    default = events.EventTrigger.ESCALATION_PERIOD
+    assert adjuster.ESCALATION_PERIOD == default
+    assert adjuster.count1 == {"X": 2, "Y": 2}
+
+    _burst(trigger, clock, 20, 2)
+    # 20 updates within 2 s escalate like a single poll 2 s later
+    assert trigger.stats["evaluations"] == 21
+    # the last update came 1.9 s after the first evaluation
+    assert adjuster.count1["X"] == Decimal("2.95")
+    assert adjuster.count1["Y"] == adjuster.count1["X"]
+
+    _burst(trigger, clock, 5, 10)
+    # and this one 10 s after it
+    assert adjuster.count1["X"] == 7
+    assert adjuster.count1["Y"] == adjuster.count1["X"]
+
+
+def test_period_of_the_rule_or_the_caller(make_adjuster, clock):
+    trigger = _trigger(make_adjuster, clock, escalation_period=4)
+    assert trigger.adjuster.ESCALATION_PERIOD == 4
+
+    adjuster = make_adjuster("newdelta", ESCALATION_PERIOD=3)
+    adjuster.register(
+        [replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)]
+    )
+    events.EventTrigger(adjuster)
+    assert adjuster.ESCALATION_PERIOD == 3
+
+
+def test_rules_without_escalation_are_left_alone(make_adjuster, clock):
+    adjuster = make_adjuster("delta")
+    events.EventTrigger(adjuster)
+    assert not hasattr(adjuster, "ESCALATION_PERIOD")
@@ -0,0 +1,77 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+from blade import order  # noqa: E402
+
+import fills  # noqa: E402
+import replay  # noqa: E402
+
+
+def _live(broker, verb, price, amount=200, otype=order.LIMIT_ORDER):
+    o = replay.ORDER_CLASSES[verb](
+        "X", Decimal(amount), Decimal(price), lambda: None, otype
+    )
+    o.desired_price = o.target_price
+    broker._post(o)
+    return o
+
+
+def _fills(seed, prices):
+    broker = replay.SimBroker(fills.QueueFill(seed, depth=10, volume=50))
+    o = _live(broker, "buy", "10.00")
+    filled = []
+    for price in prices:
+        broker.match({"X": Decimal(price)})
+        filled.append(o.filled)
+    return o, filled, broker
+
+
+def test_queue_fills_in_part_at_the_limit():
+    o, filled, broker = _fills(1, ["10.01"] * 3 + ["10.00"] * 3)
+    # nothing trades while the price is above the limit
+    assert filled[:3] == [0, 0, 0]
+    assert 0 < filled[3] <= filled[4] <= filled[5] < o.amount
+    assert o.posted and not o.completed
+    assert broker.notional["X"] == o.filled * Decimal("10.00")
+
+
+def test_queue_trading_through_fills_the_rest():
+    o, filled, _ = _fills(1, ["10.00", "9.99"])
+    assert 0 < filled[0] < o.amount
+    assert filled[1] == o.amount
+    assert o.completed and not o.posted
+
+
+def test_queue_is_deterministic_per_seed():
+    prices = ["10.00"] * 5
+    assert _fills(3, prices)[1] == _fills(3, prices)[1]
+
+
+def test_queue_works_through_the_orders_ahead():
+    model = fills.QueueFill(1, depth=1000, volume=1)
+    broker = replay.SimBroker(model)
+    o = _live(broker, "buy", "10.00")
+    ahead = model._ahead[o]
+    broker.match({"X": Decimal("10.00")})
+    assert model._ahead[o] < ahead
+    broker._cancel(o)
+    assert o not in model._ahead
+
+
+@pytest.mark.parametrize("name", sorted(fills.MODELS))
+@pytest.mark.parametrize(
+    "verb, untouched, triggered",
+    [("sell", "9.51", "9.49"), ("buy", "10.49", "10.51")],
+)
+def test_stop_loss_fills_at_the_last_price(name, verb, untouched, triggered):
+    broker = replay.SimBroker(fills.get_model(name))
+    price = "9.50" if verb == "sell" else "10.50"
+    o = _live(broker, verb, price, otype=order.STOP_LOSS_ORDER)
+    broker.match({"X": Decimal(untouched)})
+    assert o.filled == 0
+    broker.match({"X": Decimal(triggered)})
+    assert o.completed
+    assert broker.notional["X"] == o.amount * Decimal(triggered)
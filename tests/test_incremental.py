@@ -0,0 +1,67 @@
+import math
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import metrics  # noqa: E402
+import replay  # noqa: E402
+
+ASSETS = ["A%d" % i for i in range(6)]
+
+
+def _ticks():
+    # the even assets move on every tick, the odd ones every tenth tick
+    for t in range(60):
+        tick = {}
+        for i, a in enumerate(ASSETS):
+            step = t if i % 2 == 0 else t // 10 * 10
+            price = 10 + i + 0.3 * math.sin(step / 4 + i)
+            tick[a] = Decimal("%.2f" % price)
+        yield tick
+
+
+def _run(make_adjuster, clock, rule, **attrs):
+    adjuster = make_adjuster(rule, **attrs)
+    sink = metrics.HistogramSink()
+    adjuster.set_metrics(sink)
+    ticks = list(_ticks())
+    adjuster.register(
+        [
+            replay.ORDER_CLASSES["buy" if i % 2 else "sell"](
+                a, Decimal(100), ticks[0][a], clock
+            )
+            for i, a in enumerate(ASSETS)
+        ]
+    )
+    broker = replay.SimBroker()
+    for tick in ticks:
+        adjuster.c.tick = tick
+        broker.match(tick)
+        broker.sync(adjuster.get_orders(tick))
+        clock.advance(replay.TICK_PERIOD)
+    return (
+        dict(broker.filled),
+        dict(broker.notional),
+        broker.cancels,
+        broker.replaces,
+    ), sink.counters.get("assets_skipped", 0)
+
+
+@pytest.mark.parametrize("rule", ["delta", "newdelta"])
+def test_same_fills_as_a_full_evaluation(make_adjuster, clock, rule):
+    full, _ = _run(make_adjuster, clock, rule)
+    incremental, skipped = _run(
+        make_adjuster, type(clock)(), rule, INCREMENTAL=True
+    )
+    assert sum(full[0].values())
+    assert incremental == full
+    # the odd assets were left alone in between
+    assert skipped
+
+
+@pytest.mark.parametrize("rule", ["delta", "newdelta"])
+def test_nothing_skipped_by_default(make_adjuster, clock, rule):
+    _, skipped = _run(make_adjuster, clock, rule)
+    assert not skipped
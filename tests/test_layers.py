@@ -0,0 +1,115 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import priceadjust  # noqa: E402
+from priceadjust import _Layer, _LayerPlan  # noqa: E402
+
+
+def _config(monkeypatch, **values):
+    # factory has to be passed, as the engine's config may require it
+    def get_from_config(key, section, factory):
+        assert section == "dynlayers"
+        return factory(values[key])
+
+    monkeypatch.setattr(priceadjust.config, "get_from_config", get_from_config)
+
+
+def _load():
+    return _LayerPlan.load("dynlayers")
+
+
+def test_parse():
+    assert _LayerPlan.parse("2:0.4:0.001, 1:0.6:-0.002:stop") == [
+        _Layer(2, Decimal("0.4"), Decimal("0.001"), False),
+        _Layer(1, Decimal("0.6"), Decimal("-0.002"), True),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text", ["1:0.5", "1:0.5:0:limit", "x:0.5:0", "1:0.5:0:stop:1", ""]
+)
+def test_parse_rejects_bad_specs(text):
+    with pytest.raises(ValueError):
+        _LayerPlan.parse(text)
+
+
+# the config isn't read unless LAYER_SECTION is set
+def test_dynlayers_default_table(monkeypatch, make_adjuster, clock):
+    replay = pytest.importorskip("replay")
+    _config(monkeypatch)
+    adjuster = make_adjuster("dynlayers")
+    adjuster.register(
+        [replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)]
+    )
+    assert adjuster.layers.layers == priceadjust._DynLayers.LAYER_TABLE
+    assert adjuster.layers.stop_loss_to_limit_layer == 3
+
+
+def test_load_from_config(monkeypatch):
+    _config(
+        monkeypatch,
+        layers="1:0.5:0.001, 2:0.5:0.002:stop",
+        stop_loss_to_limit_layer="1",
+    )
+    plan = _load()
+    assert plan.order == (1, 2)
+    assert plan.stop_loss_layers == {2}
+    assert plan.stop_loss_to_limit_layer == 1
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        dict(layers="1:0.5", stop_loss_to_limit_layer="1"),
+        dict(layers="1:0.5:0", stop_loss_to_limit_layer="three"),
+    ],
+)
+def test_load_raises_on_malformed_config(monkeypatch, values):
+    _config(monkeypatch, **values)
+    with pytest.raises(ValueError):
+        _load()
+
+
+def test_next_layer_skips_gaps():
+    plan = _LayerPlan(
+        _LayerPlan.parse("3:0.5:0.001, 5:0.3:0.002, 7:0.2:0.003:stop"), 3
+    )
+    assert plan.next_layer == {3: 5, 5: 7}
+    assert plan.highest_limit_layer == 5
+
+
+@pytest.mark.parametrize(
+    "text, stop_loss_to_limit_layer",
+    [("1:0.5:0, 1:0.5:0", 1), ("1:0.5:0, 2:0.5:0:stop", 2)],
+)
+def test_plan_rejects_inconsistent_tables(text, stop_loss_to_limit_layer):
+    with pytest.raises(ValueError):
+        _LayerPlan(_LayerPlan.parse(text), stop_loss_to_limit_layer)
+
+
+# orders bubble up into the next layer that exists
+def test_dynlayers_with_gaps(monkeypatch, make_adjuster, clock):
+    replay = pytest.importorskip("replay")
+    _config(
+        monkeypatch,
+        layers="3:0.5:0.001, 5:0.5:0.002",
+        stop_loss_to_limit_layer="3",
+    )
+    adjuster = make_adjuster("dynlayers", LAYER_SECTION="dynlayers")
+    orig = replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)
+    adjuster.register([orig])
+    broker = replay.SimBroker()
+    for price in map(Decimal, ["10.00", "10.10", "10.20", "9.00", "9.00"]):
+        tick = {"X": price}
+        adjuster.c.tick = tick
+        broker.match(tick)
+        orders = adjuster.get_orders(tick)
+        for o in orders:
+            adjuster.adjust(o, tick)
+            assert o.layer in (3, 5)
+        broker.sync(orders)
+        clock.advance(replay.TICK_PERIOD)
+    assert broker.filled["X"] == 100
@@ -0,0 +1,20 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import metrics  # noqa: E402
+import replay  # noqa: E402
+
+
+def test_cancels_count_transitions_only(make_adjuster, clock):
+    adjuster = make_adjuster("target")
+    sink = metrics.HistogramSink()
+    adjuster.set_metrics(sink)
+    o = replay.SimBuyOrder("X", Decimal(10), Decimal("10.00"), clock)
+    adjuster.register([o])
+    adjuster._cancel(o)
+    adjuster._cancel(o)
+    assert o._to_cancel
+    assert sink.counters["cancels"] == 1
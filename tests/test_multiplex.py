@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import multiplex  # noqa: E402
+import replay  # noqa: E402
+
+
+def _adjusters(make_adjuster, clock):
+    adjusters = {}
+    for name, verb in (("a", "buy"), ("b", "sell")):
+        adjuster = make_adjuster("target")
+        adjuster.register(
+            [
+                replay.ORDER_CLASSES[verb](
+                    "X", Decimal(10), Decimal("10.00"), clock
+                )
+            ]
+        )
+        adjusters[name] = adjuster
+    return adjusters
+
+
+def test_serial_by_default(make_adjuster, clock):
+    mux = multiplex.Multiplexer(_adjusters(make_adjuster, clock))
+    assert mux._executor is None
+    assert len(mux.get_orders({"X": Decimal("10.00")})) == 2
+
+
+def test_threads_are_opt_in(make_adjuster, clock):
+    mux = multiplex.Multiplexer(_adjusters(make_adjuster, clock), workers=2)
+    try:
+        assert mux._executor is not None
+        assert len(mux.get_orders({"X": Decimal("10.00")})) == 2
+    finally:
+        mux.close()
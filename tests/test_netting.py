@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import netting  # noqa: E402
+import replay  # noqa: E402
+
+
+def _order(verb, amount, price, clock):
+    return replay.ORDER_CLASSES[verb](
+        "X", Decimal(amount), Decimal(price), clock
+    )
+
+
+@pytest.fixture
+def baskets(clock):
+    # 100 + 50 to buy against 60 to sell: 60 cross, 90 go to the market
+    return {
+        "a": [_order("buy", 100, "10.00", clock)],
+        "b": [_order("buy", 50, "10.20", clock)],
+        "c": [_order("sell", 60, "10.10", clock)],
+    }
+
+
+def test_crosses_and_residual(baskets):
+    n = netting.Netting(baskets)
+    assert n.crossed_amount() == 60
+    (residual,) = n.residual
+    assert residual.is_buy()
+    assert residual.amount == 90
+    # what is left of a and b, at their average price
+    assert (
+        residual.target_price
+        == (40 * Decimal("10.00") + 50 * Decimal("10.20")) / 90
+    )
+
+
+def test_settle_allocates_residual_fills_in_order(baskets):
+    n = netting.Netting(baskets, prices={"X": Decimal("10.05")})
+    (residual,) = n.residual
+    residual.filled = Decimal(70)
+    result = n.settle({residual: Decimal(70) * Decimal("10.08")})
+    (a,), (b,), (c,) = baskets.values()
+    # a crossed 60 and gets the first 40 of the residual, b the next 30
+    assert result[a] == (
+        100,
+        60 * Decimal("10.05") + 40 * Decimal("10.08"),
+    )
+    assert result[b] == (30, 30 * Decimal("10.08"))
+    assert result[c] == (60, 60 * Decimal("10.05"))
+
+
+def test_settle_without_notional(baskets):
+    n = netting.Netting(baskets, prices={"X": Decimal("10.05")})
+    (residual,) = n.residual
+    residual.filled = Decimal(20)
+    result = n.settle()
+    (a,), (b,), _ = baskets.values()
+    # fills are allocated, their notional isn't known
+    assert result[a] == (80, 60 * Decimal("10.05"))
+    assert result[b] == (0, 0)
+
+
+def test_untouched_order_goes_to_the_market(clock):
+    o = _order("buy", 100, "10.00", clock)
+    n = netting.Netting({"a": [o]})
+    assert n.residual == [o]
+    o.filled = Decimal(100)
+    assert n.settle() == {o: (100, 0)}
@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import replay  # noqa: E402
+
+
+@pytest.mark.parametrize("rule", ["delta", "newdelta"])
+def test_get_orders_before_register(make_adjuster, rule):
+    adjuster = make_adjuster(rule)
+    assert adjuster.params is None
+    assert adjuster.get_orders({"X": Decimal("10.00")}) == set()
+
+
+@pytest.mark.parametrize("rule", ["delta", "newdelta"])
+def test_snapshot_at_register(make_adjuster, clock, rule):
+    adjuster = make_adjuster(rule)
+    adjuster.param_overrides["ParZ"] = "0.5"
+    adjuster.register(
+        [replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)]
+    )
+    assert adjuster.params.ParZ == Decimal("0.5")
+    # later overrides wait for the next register()
+    adjuster.param_overrides["ParZ"] = "0.25"
+    adjuster.c.tick = {"X": Decimal("10.00")}
+    adjuster.get_orders(adjuster.c.tick)
+    assert adjuster.params.ParZ == Decimal("0.5")
+    adjuster.reload_params()
+    assert adjuster.params.ParZ == Decimal("0.25")
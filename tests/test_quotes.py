@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import replay  # noqa: E402
+
+
+class _CountingContext(replay.SimContext):
+    def __init__(self):
+        super().__init__(120)
+        self.batches = 0
+
+    def get_quotes(self, assets):
+        self.batches += 1
+        return super().get_quotes(assets)
+
+
+def _run(make_adjuster, clock, rule):
+    adjuster = make_adjuster(rule)
+    c = adjuster.c = _CountingContext()
+    adjuster.quotes.c = c
+    adjuster.register(
+        [
+            replay.SimBuyOrder(a, Decimal(10), Decimal("10.00"), clock)
+            for a in ("X", "Y")
+        ]
+    )
+    for _ in range(3):
+        c.tick = tick = {"X": Decimal("10.00"), "Y": Decimal("10.00")}
+        for o in adjuster.get_orders(tick):
+            adjuster.adjust(o, tick)
+        clock.advance(replay.TICK_PERIOD)
+    return c.batches
+
+
+def test_no_quotes_fetched_for_rules_without_quotes(make_adjuster, clock):
+    assert _run(make_adjuster, clock, "target") == 0
+    assert _run(make_adjuster, clock, "ticker") == 0
+
+
+def test_one_batch_per_tick(make_adjuster, clock):
+    assert _run(make_adjuster, clock, "askbid") == 3
@@ -0,0 +1,80 @@
+import csv
+import gzip
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import recorder  # noqa: E402
+import tape  # noqa: E402
+
+
+class Quotes:
+    def __init__(self, bid_ask):
+        self._bid_ask = bid_ask
+
+    def bid_ask(self):
+        return self._bid_ask
+
+
+def _read(path):
+    with gzip.open(path, "rt", newline="") as f:
+        return list(csv.reader(f))
+
+
+def _sibling(path, suffix):
+    return path[: -len(".csv.gz")] + suffix + ".csv.gz"
+
+
+def test_write_and_read(tmp_path):
+    r = recorder.TapeRecorder(str(tmp_path))
+    ticks = [
+        {"X": Decimal("10.00"), "Y": Decimal("20.50")},
+        {"X": Decimal("10.01")},
+        {"X": Decimal("9.99"), "Y": Decimal("20.25")},
+    ]
+    for tick in ticks:
+        r.record(tick, Quotes({"X": [Decimal("9.98"), Decimal("10.02")]}))
+    r.close()
+    assert r.dropped == 0
+    (path,) = r.paths
+    assert list(tape.load(path).iter_ticks()) == ticks
+    assert _read(_sibling(path, ".bid")) == [
+        ["X", "Y"],
+        ["9.98", ""],
+        ["9.98", ""],
+        ["9.98", ""],
+    ]
+    assert _read(_sibling(path, ".ask"))[1] == ["10.02", ""]
+    times = _read(_sibling(path, recorder.TIME_SUFFIX))
+    assert times[0] == ["time"]
+    assert len(times) == 4
+    assert [float(t) for (t,) in times[1:]] == sorted(
+        float(t) for (t,) in times[1:]
+    )
+
+
+def test_rotate(tmp_path):
+    r = recorder.TapeRecorder(str(tmp_path), rotate_rows=2)
+    for i in range(5):
+        r.record({"X": Decimal(10 + i)})
+    # a symbol that isn't a column yet starts a new file
+    r.record({"X": Decimal(20), "Y": Decimal(30)})
+    r.close()
+    assert len(r.paths) == 4
+    tapes = [tape.read_csv(p) for p in r.paths]
+    assert [len(t) for t in tapes] == [2, 2, 1, 1]
+    assert [t.prices[0, 0] for t in tapes] == [10, 12, 14, 20]
+    assert tapes[-1].symbols == ["X", "Y"]
+
+
+def test_the_last_tick_waits_for_the_next(tmp_path):
+    r = recorder.TapeRecorder(str(tmp_path))
+    r.record({"X": Decimal(10)})
+    # held back until its quotes are complete
+    assert r._queue.empty()
+    assert r.paths == []
+    r.close()
+    assert r._held is None
+    assert len(tape.read_csv(r.paths[0])) == 1
@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import coalesce  # noqa: E402
+import replay  # noqa: E402
+
+
+def _run(make_adjuster, clock, replace_orders):
+    adjuster = make_adjuster("delta", REPLACE_ORDERS=replace_orders)
+    orig = replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)
+    adjuster.register([orig])
+    broker = replay.SimBroker()
+    prices = ["9.50", "9.60", "9.60", "9.60", "9.40", "9.00", "9.00"]
+    partially_filled = False
+    for price in map(Decimal, prices):
+        tick = {"X": price}
+        adjuster.c.tick = tick
+        broker.match(tick)
+        if not partially_filled and broker.live:
+            # half of the live child fills, then the price moves away and
+            # the child is repriced
+            (child,) = broker.live
+            broker._fill(child, child.amount / 2, child.actual_price)
+            partially_filled = True
+        orders = adjuster.get_orders(tick)
+        broker.sync(orders)
+        # what is filled plus what is still open never exceeds the order
+        open_amount = sum(o.amount - o.filled for o in broker.live)
+        assert broker.filled["X"] + open_amount <= orig.amount
+        clock.advance(replay.TICK_PERIOD)
+    assert partially_filled
+    return broker
+
+
+@pytest.mark.parametrize("replace_orders", [False, True])
+def test_partially_filled_replace(make_adjuster, clock, replace_orders):
+    broker = _run(make_adjuster, clock, replace_orders)
+    assert broker.filled["X"] == 100
+    assert bool(broker.replaces) == replace_orders
+
+
+class _Order:
+    def __init__(self, amount, filled=0):
+        self.amount = Decimal(amount)
+        self.filled = Decimal(filled)
+
+
+def test_trim_takes_late_fills_off_the_successor():
+    old = _Order(100, filled=50)
+    new = _Order(50)
+    new._replaces = old
+    new._replaces_filled = Decimal(50)
+    assert coalesce.trim(new)
+    assert new.amount == 50
+
+    old.filled = Decimal(80)
+    assert coalesce.trim(new)
+    assert new.amount == 20
+
+    old.filled = Decimal(100)
+    assert not coalesce.trim(new)
+
+
+def test_trim_leaves_plain_orders_alone():
+    o = _Order(10)
+    assert coalesce.trim(o)
+    o._replaces = o
+    assert coalesce.trim(o)
+    assert o.amount == 10
+
+
+def test_driver_trims_successor_filled_while_queued(make_adjuster, clock):
+    asyncio = pytest.importorskip("asyncio")
+    driver = pytest.importorskip("driver")
+    old = replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)
+    new = replay.SimBuyOrder("X", Decimal(50), Decimal("10.00"), clock)
+    old.filled = Decimal(50)
+    old.posted = True
+    new.desired_price = Decimal("9.99")
+    new._replaces = old
+    new._replaces_filled = old.filled
+    broker = driver.FakeBroker(latency=0)
+    broker.live[old] = (Decimal("10.00"), old.type)
+
+    async def run():
+        d = driver.AsyncDriver(make_adjuster("delta"), broker)
+        d._semaphore = asyncio.Semaphore(1)
+        # another 30 fill before the replace is sent
+        old.filled += 30
+        await d._replace(old, new)
+        return d
+
+    d = asyncio.run(run())
+    assert d.stats["replaces"] == 1
+    assert new.amount == 20
+    assert broker.live == {new: (Decimal("9.99"), new.desired_type)}
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import replay  # noqa: E402
+
+
+@pytest.fixture
+def tape_path(tmp_path):
+    # X dips below its first price halfway through, Y only goes up
+    rows = ["X,Y"]
+    for i in range(20):
+        x = "10.00" if i < 10 else "9.90"
+        rows.append("%s,%.2f" % (x, 20 + i * 0.01))
+    path = tmp_path / "ticks.csv"
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+def _segments(tape_path, rule):
+    return replay.make_segments(
+        tape_path, [rule], window=20, notional=Decimal(1000)
+    )
+
+
+def test_segments(tape_path):
+    segments = _segments(tape_path, "target")
+    assert [(s.asset, s.start, s.stop) for s in segments] == [
+        ("X", 0, 20),
+        ("Y", 0, 20),
+    ]
+
+
+def test_target_fills_when_touched(tape_path):
+    results = {
+        r.asset: r
+        for r in map(replay.run_segment, _segments(tape_path, "target"))
+    }
+    x, y = results["X"], results["Y"]
+    assert x.amount == x.filled == 100
+    assert x.notional == 1000
+    assert y.filled == 0
+
+
+def test_summarize(tape_path):
+    results = [replay.run_segment(s) for s in _segments(tape_path, "target")]
+    summary = replay.summarize(results)["target"]
+    assert summary["segments"] == 2
+    assert summary["fill_ratio"] == pytest.approx(100 / 150)
+    assert summary["slippage_bps"] == 0
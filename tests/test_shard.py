@@ -0,0 +1,140 @@
+import functools
+import math
+import os
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import priceadjust  # noqa: E402
+import replay  # noqa: E402
+import shard  # noqa: E402
+from conftest import PARAMS, Clock  # noqa: E402
+
+ASSETS = ["A%d" % i for i in range(8)]
+TICKS = 60
+TRADING_INTERVAL = TICKS * replay.TICK_PERIOD
+
+
+def _ticks():
+    # every asset swings around its first price, some of them far enough
+    # to get filled
+    for t in range(TICKS):
+        yield {
+            a: Decimal(
+                "%.2f"
+                % (10 + i + (0.02 + 0.01 * i) * math.sin(t / 5 + i) * 10)
+            )
+            for i, a in enumerate(ASSETS)
+        }
+
+
+def _run(rule, shards, settings=None):
+    clock = Clock()
+    c = replay.SimContext(TRADING_INTERVAL)
+    ticks = list(_ticks())
+    orders = [
+        replay.ORDER_CLASSES["buy" if i % 2 else "sell"](
+            a, Decimal(100), ticks[0][a], clock
+        )
+        for i, a in enumerate(ASSETS)
+    ]
+    overrides = PARAMS.get(rule, {})
+    if shards:
+        adjuster = shard.ShardedAdjuster(
+            rule,
+            c,
+            functools.partial(replay.SimContext, TRADING_INTERVAL),
+            shards,
+            settings=settings,
+            param_overrides=overrides,
+        )
+    else:
+        adjuster = priceadjust.get_rules(rule)(c)
+        adjuster.param_overrides = dict(overrides)
+        for name, value in (settings or {}).items():
+            setattr(adjuster, name, value)
+    broker = replay.SimBroker()
+    try:
+        adjuster.register(orders)
+        reprice = priceadjust.needs_adjust(adjuster)
+        for tick in ticks:
+            c.tick = tick
+            broker.match(tick)
+            out = adjuster.get_orders(tick)
+            if reprice:
+                for o in out:
+                    adjuster.adjust(o, tick)
+            broker.sync(out)
+            clock.advance(replay.TICK_PERIOD)
+    finally:
+        if shards:
+            adjuster.close()
+    return (
+        dict(broker.filled),
+        broker.cancels,
+        broker.replaces,
+        [o.filled for o in orders],
+    )
+
+
+@pytest.mark.parametrize("rule", sorted(priceadjust._RULES))
+@pytest.mark.parametrize("settings", [None, {"REPLACE_ORDERS": True}])
+def test_same_fills_as_one_adjuster(rule, settings):
+    single = _run(rule, 0, settings)
+    # something gets filled, so there is something to compare
+    assert sum(single[0].values())
+    assert _run(rule, 3, settings) == single
+
+
+def _register(adjuster, clock):
+    adjuster.register(
+        [
+            replay.ORDER_CLASSES["buy"](
+                a, Decimal(100), Decimal("10.00"), clock
+            )
+            for a in ASSETS
+        ]
+    )
+    return [p for _, p, _, _ in adjuster._workers], [
+        adjuster._ticks_shm.name
+    ] + [s.name for _, _, _, s in adjuster._workers]
+
+
+def _released(processes, names):
+    return not any(p.is_alive() for p in processes) and not any(
+        os.path.exists("/dev/shm/" + n.lstrip("/")) for n in names
+    )
+
+
+def _sharded():
+    return shard.ShardedAdjuster(
+        "target",
+        replay.SimContext(TRADING_INTERVAL),
+        functools.partial(replay.SimContext, TRADING_INTERVAL),
+        2,
+    )
+
+
+def test_context_manager_releases(clock):
+    with _sharded() as adjuster:
+        processes, names = _register(adjuster, clock)
+        assert not _released(processes, names)
+    assert _released(processes, names)
+    # closing twice is harmless
+    adjuster.close()
+
+
+def test_dropped_adjuster_is_released(clock):
+    adjuster = _sharded()
+    processes, names = _register(adjuster, clock)
+    del adjuster
+    assert _released(processes, names)
+
+
+def test_register_again_releases(clock):
+    with _sharded() as adjuster:
+        processes, names = _register(adjuster, clock)
+        _register(adjuster, clock)
+        assert _released(processes, names)
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+pytest.importorskip("numpy")
+
+import replay  # noqa: E402
+import sizing  # noqa: E402
+
+TARGETS = {"A": "10.00", "B": "41.41", "C": "227.95", "D": "0.5123"}
+
+
+def _adjuster(make_adjuster, clock, **attrs):
+    adjuster = make_adjuster("newdelta", **attrs)
+    adjuster.register(
+        [
+            replay.ORDER_CLASSES["sell" if i % 2 else "buy"](
+                a, Decimal(100 * (i + 1)), Decimal(target), clock
+            )
+            for i, (a, target) in enumerate(TARGETS.items())
+        ]
+    )
+    return adjuster
+
+
+# prices a relative move away from every target
+def _tick(move):
+    return {
+        a: Decimal(target) * (1 + Decimal(move))
+        for a, target in TARGETS.items()
+    }
+
+
+# on both sides of zero, at zero and past delta_bad_cap
+MOVES = ["-0.02", "-0.001", "0", "0.001", "0.02"]
+
+
+@pytest.mark.parametrize("move", MOVES)
+def test_matches_reference(make_adjuster, clock, move):
+    adjuster = _adjuster(make_adjuster, clock)
+    assert sizing.matches_reference(adjuster, _tick(move))
+
+
+def test_matches_reference_as_time_goes_by(make_adjuster, clock):
+    adjuster = _adjuster(make_adjuster, clock)
+    for move in MOVES * 4:
+        tick = adjuster.c.tick = _tick(move)
+        adjuster.get_orders(tick)
+        adjuster._get_original_order("A").filled += 5
+        clock.advance(10)
+        assert sizing.matches_reference(adjuster, tick)
+        assert sizing.matches_reference(adjuster, tick, ["C", "A"])
+
+
+def test_batch_sizing_decides_the_same(make_adjuster, clock):
+    def run(**attrs):
+        adjuster = _adjuster(make_adjuster, type(clock)(), **attrs)
+        trace = []
+        for move in MOVES * 2:
+            tick = adjuster.c.tick = _tick(move)
+            orders = adjuster.get_orders(tick)
+            trace.append(
+                sorted((o.asset, o.amount, o.desired_price) for o in orders)
+            )
+            adjuster.all_orders[0].time_cb.advance(10)
+        return trace
+
+    assert run(BATCH_SIZING_MIN_ASSETS=1) == run()
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("blade")
+
+import priceadjust  # noqa: E402
+import replay  # noqa: E402
+import sweep  # noqa: E402
+
+from conftest import PARAMS  # noqa: E402
+
+
+@pytest.fixture
+def delta_config(monkeypatch):
+    values = dict(PARAMS["delta"])
+
+    def get_from_config(key, section, factory=str):
+        return factory(values[key])
+
+    monkeypatch.setattr(priceadjust.config, "get_from_config", get_from_config)
+    return values
+
+
+@pytest.fixture
+def key(tmp_path):
+    tape = tmp_path / "ticks.csv"
+    tape.write_text("X\n10\n")
+    cache = sweep.ResultCache(str(tmp_path / "cache.sqlite"))
+
+    def key(params=()):
+        segment = replay.Segment(
+            "delta", "buy", "X", 0, 1, str(tape), 10000, 1, params
+        )
+        return cache.key(segment)
+
+    return key
+
+
+def test_key_follows_the_config(delta_config, key, tmp_path):
+    before = key()
+    delta_config["ParZ"] = "0.5"
+    cache = sweep.ResultCache(str(tmp_path / "cache.sqlite"))
+    segment = replay.Segment(
+        "delta", "buy", "X", 0, 1, str(tmp_path / "ticks.csv"), 10000, 1
+    )
+    assert cache.key(segment) != before
+
+
+def test_key_is_by_effective_value(delta_config, key):
+    # overriding a parameter with the value the config has changes nothing
+    assert key((("ParZ", delta_config["ParZ"]),)) == key()
+    assert key((("ParZ", "0.5"),)) != key()
+
+
+def test_fingerprint_covers_the_replay_path():
+    assert {"replay", "fills", "tape", "coalesce"} <= set(sweep.REPLAY_MODULES)
@@ -0,0 +1,62 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import tape  # noqa: E402
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "ticks.csv"
+    path.write_text("X,Y\n10.00,20.5\n10.01,\n9.99,20.25\n")
+    return str(path)
+
+
+def test_round_trip(csv_path):
+    t = tape.load(csv_path)
+    assert os.path.exists(csv_path + tape.CACHE_SUFFIX)
+    assert isinstance(t.prices, np.memmap)
+    assert t.symbols == ["X", "Y"]
+    assert len(t) == 3
+    assert list(t.iter_ticks()) == [
+        {"X": Decimal("10.0"), "Y": Decimal("20.5")},
+        {"X": Decimal("10.01")},
+        {"X": Decimal("9.99"), "Y": Decimal("20.25")},
+    ]
+    assert t.tick(1, ["Y", "X"]) == {"X": Decimal("10.01")}
+    np.testing.assert_array_equal(t.prices, tape.read_csv(csv_path).prices)
+
+
+def test_cache_is_reused(csv_path):
+    tape.load(csv_path)
+    cache_path = csv_path + tape.CACHE_SUFFIX
+    mtime = os.stat(cache_path).st_mtime_ns
+    assert tape.load(csv_path).path == cache_path
+    assert os.stat(cache_path).st_mtime_ns == mtime
+
+
+def test_cache_follows_the_source(csv_path):
+    tape.load(csv_path)
+    with open(csv_path, "a") as f:
+        f.write("9.98,20.0\n")
+    t = tape.load(csv_path)
+    assert len(t) == 4
+    assert t.tick(3) == {"X": Decimal("9.98"), "Y": Decimal("20.0")}
+
+
+def test_broken_cache_is_rebuilt(csv_path):
+    cache_path = csv_path + tape.CACHE_SUFFIX
+    with open(cache_path, "wb") as f:
+        f.write(b"not a tape\n")
+    assert len(tape.load(csv_path)) == 3
+    with open(cache_path, "rb") as f:
+        assert f.readline() == tape.MAGIC
+
+
+def test_without_cache(csv_path):
+    t = tape.load(csv_path, cache=False)
+    assert not os.path.exists(csv_path + tape.CACHE_SUFFIX)
+    assert t.path == csv_path
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+from priceadjust import _TickGrid  # noqa: E402
+
+D = Decimal
+
+
+@pytest.mark.parametrize(
+    "size, price, floor, ceil",
+    [
+        ("0.01", "10.123", "10.12", "10.13"),
+        ("0.01", "10.12", "10.12", "10.12"),
+        ("0.01", "394", "394.00", "394.00"),
+        ("0.0001", "0.12345", "0.1234", "0.1235"),
+        ("0.05", "10.12", "10.10", "10.15"),
+        ("0.05", "10.15", "10.15", "10.15"),
+        ("0.25", "99.3", "99.25", "99.50"),
+        ("1", "12.5", "12", "13"),
+    ],
+)
+def test_rounding(size, price, floor, ceil):
+    grid = _TickGrid.get(D(size))
+    assert grid.floor(D(price)) == D(floor)
+    assert grid.ceil(D(price)) == D(ceil)
+    assert str(grid.floor(D(price))) == floor
+
+
+def test_negative_prices_round_towards_the_grid():
+    grid = _TickGrid.get(D("0.05"))
+    assert grid.floor(D("-0.07")) == D("-0.10")
+    assert grid.ceil(D("-0.07")) == D("-0.05")
+
+
+@pytest.mark.parametrize(
+    "sub_penny_below, price, better",
+    [(None, "0.56789", "0.56"), (D(1), "0.56789", "0.5678")],
+)
+def test_sub_penny_is_opt_in(make_adjuster, sub_penny_below, price, better):
+    adjuster = make_adjuster("target", SUB_PENNY_BELOW=sub_penny_below)
+    assert adjuster._adjust_to_better("X", "buy", D(price)) == D(better)
+
+
+def test_tick_sizes_per_asset(make_adjuster):
+    adjuster = make_adjuster("target", TICK_SIZES={"X": D("0.05")})
+    assert adjuster._adjust_to_better("X", "buy", D("10.12")) == D("10.10")
+    assert adjuster._adjust_to_better("X", "sell", D("10.12")) == D("10.15")
+    assert adjuster._adjust_to_worse("X", "buy", D("10.12")) == D("10.15")
+    assert adjuster._adjust_to_better("Y", "buy", D("10.129")) == D("10.12")
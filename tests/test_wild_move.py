@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("blade")
+
+import replay  # noqa: E402
+
+
+def _adjuster(make_adjuster, clock, engine_says=False, **attrs):
+    adjuster = make_adjuster("target", **attrs)
+    adjuster.c.is_wild_price_move = lambda asset, is_buy: engine_says
+    orig = replay.SimBuyOrder("X", Decimal(100), Decimal("10.00"), clock)
+    adjuster.register([orig])
+    prices = ["10.00", "10.01"] * adjuster.STATS_WINDOW + ["10.50"]
+    for price in map(Decimal, prices):
+        adjuster.get_orders({"X": price})
+    return adjuster
+
+
+def test_stats_are_opt_in(make_adjuster, clock):
+    adjuster = _adjuster(make_adjuster, clock, WILD_MOVE_SIGMAS=2)
+    assert not adjuster._is_wild_price_move("X", True)
+
+
+def test_stats_detect_moves_against_the_order(make_adjuster, clock):
+    adjuster = _adjuster(
+        make_adjuster, clock, WILD_MOVE_STATS=True, WILD_MOVE_SIGMAS=2
+    )
+    assert adjuster._is_wild_price_move("X", True)
+    assert not adjuster._is_wild_price_move("X", False)
+
+
+def test_engine_signal_is_kept(make_adjuster, clock):
+    adjuster = _adjuster(
+        make_adjuster, clock, engine_says=True, WILD_MOVE_STATS=True
+    )
+    assert adjuster._is_wild_price_move("X", False)
+
+
+def test_no_stats_kept_by_default(make_adjuster, clock):
+    adjuster = _adjuster(make_adjuster, clock)
+    assert adjuster.stats.get("X") is None
+
+
+def test_stats_kept_on_request(make_adjuster, clock):
+    adjuster = _adjuster(make_adjuster, clock, ROLLING_STATS=True)
+    assert len(adjuster.stats["X"].returns) == adjuster.STATS_WINDOW
+    assert not adjuster._is_wild_price_move("X", True)